@@ -0,0 +1,575 @@
+# 界面：每路音频输入一个字幕窗口，启动入口见 main.py
+import sys, threading, pyaudio, os, time, argparse
+from collections import deque
+from datetime import datetime
+from subtitle_engine import AudioProcessor, SubtitleServer, TranslationPool, list_engines, models, warm_up
+from subtitle_engine.metrics import metrics, PrometheusExporter, JsonlExporter
+from subtitle_engine.transcript import TranscriptWriter
+from subtitle_engine.store import TranscriptStore
+from subtitle_engine.workers import isolate_engines, stop_workers
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QObject
+from PyQt5.QtGui import QTextCursor, QTextDocument
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel,
+                            QSizePolicy, QPushButton, QHBoxLayout, QScrollArea,
+                            QMenu, QAction, QFileDialog, QSplitter, QTextEdit, QComboBox)
+
+class ProcessorSignals(QObject):
+    # 把处理器在工作线程中发出的信号转发到界面线程，附带发出时间用于统计渲染延迟
+    text_ready = pyqtSignal(str, float)
+    translation_ready = pyqtSignal(str, int, float)
+    sentence_finished = pyqtSignal(str, str)
+    history_added = pyqtSignal(str, str)
+    models_ready = pyqtSignal(str)
+    language_changed = pyqtSignal(str, str)
+
+    def __init__(self, audio_processor):
+        super().__init__()
+        audio_processor.text_ready.connect(
+            lambda text: self.text_ready.emit(text, time.monotonic()))
+        audio_processor.translation_ready.connect(
+            lambda text, skipped: self.translation_ready.emit(text, skipped, time.monotonic()))
+        audio_processor.sentence_finished.connect(self.sentence_finished.emit)
+        audio_processor.history_added.connect(self.history_added.emit)
+        audio_processor.language_changed.connect(self.language_changed.emit)
+
+def list_input_devices(p):
+    return [(i, p.get_device_info_by_index(i)) for i in range(p.get_device_count())
+            if p.get_device_info_by_index(i)['maxInputChannels'] > 0]
+
+def find_input_device(p, spec=None):
+    # spec 为设备编号或名称中的一段（不区分大小写）；未指定时使用默认主机 API 的第一个输入设备
+    devices = list_input_devices(p)
+    if spec is None:
+        return next((i for i, dev in devices if dev['hostApi'] == 0), None)
+    if str(spec).isdigit():
+        return int(spec)
+    for i, dev in devices:
+        if str(spec).lower() in dev['name'].lower():
+            return i
+    raise ValueError(f'找不到输入设备: {spec}')
+
+# 历史面板全量重建时显示的最近句数
+history_display_limit = 500
+
+class SubtitleWindow(QMainWindow):
+    # 每个窗口对应一路音频输入；多路输入时各窗口共享识别模型和 translation_pool 中的翻译线程
+    # audio_options: 传给 AudioProcessor 的音频缓冲设置（frames_per_buffer、buffer_seconds、catch_up 等）
+    def __init__(self, device=None, translation_pool=None, stream_name=None, audio_options=None):
+        super().__init__()
+        self.device = device
+        self.audio_options = audio_options or {}
+        self.translation_pool = translation_pool
+        self.stream_name = stream_name
+        self.font_sizes = {'超小': 12, '小': 14, '中': 18, '大': 22, '超大': 26}
+        self.current_font_size = '中'
+        self.show_history = True  # 默认显示历史记录
+        self.history_mode = 'sentence'  # 'sentence' 或 'paragraph'
+        self.original_old = ""
+        self.original_new = ""
+        self.translated_old = ""
+        self.translated_new = ""
+        # 历史记录按句保存原文与译文，两种显示模式各自维护一个文档，新句子只做追加；
+        # 全量重建文档时只用最近 history_display_limit 句，完整记录在记录库中
+        self.history_sources = deque(maxlen=history_display_limit)
+        self.history_targets = deque(maxlen=history_display_limit)
+        
+        self.initUI()
+        self.setup_audio_processor()
+        self.update_pair_combo(self.audio_processor.language_pair)
+        self.signals.sentence_finished.connect(self.handle_sentence_finished)
+        self.signals.history_added.connect(self.append_history)
+        self.signals.language_changed.connect(self.handle_language_changed)
+        # 窗口先显示，模型在后台加载
+        self.signals.models_ready.connect(self.handle_models_ready)
+        if self.audio_options.get('isolate'):
+            # 模型都在子进程中加载：在翻译进程中预加载当前引擎，再等识别进程就绪
+            warm_up(langs=(), engines=(self.audio_processor.translation_engine,),
+                    on_done=self.isolated_models_loaded)
+        else:
+            warm_up(on_done=lambda error: self.signals.models_ready.emit(str(error) if error else ''))
+        
+        # 初始化时设置正确的按钮状态
+        self.start_button.setChecked(False)
+        self.start_button.setText('暂停')
+        self.audio_processor.is_paused = True  # 确保初始状态为暂停
+        # 初始化自动保存文件
+        self.init_auto_save_file()
+
+    def initUI(self):
+        self.setWindowTitle('实时字幕与翻译')
+        self.setGeometry(100, 100, 1000, 600)  # 增加窗口默认大小
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        main_layout = QVBoxLayout(central_widget)
+        
+        # 控制按钮区域 - 所有按钮放在一行
+        button_layout = QHBoxLayout()
+        
+        # 开始/暂停按钮
+        button_layout.addWidget(QLabel('当前状态：'))
+        self.start_button = QPushButton('暂停')
+        self.start_button.setCheckable(True)
+        self.start_button.clicked.connect(self.toggle_start)
+        button_layout.addWidget(self.start_button)
+        
+        # 置顶按钮
+        self.pin_button = QPushButton('置顶')
+        self.pin_button.setCheckable(True)
+        self.pin_button.clicked.connect(self.toggle_pin)
+        button_layout.addWidget(self.pin_button)
+        
+        # 清空按钮
+        self.clear_button = QPushButton('清空')
+        self.clear_button.clicked.connect(self.clear_text)
+        button_layout.addWidget(self.clear_button)
+        
+        # 字体大小按钮
+        self.font_button = QPushButton('字号')
+        self.font_button.clicked.connect(self.show_font_menu)
+        button_layout.addWidget(self.font_button)
+        
+        # 识别语言与翻译语言对选择，列出已下载模型的识别语言
+        button_layout.addWidget(QLabel('识别语言:'))
+        self.source_combo = QComboBox()
+        for lang in models.list_source_languages(available_only=True) or ['english']:
+            self.source_combo.addItem(models.language_display_names.get(lang, lang), lang)
+        self.source_combo.currentIndexChanged.connect(
+            lambda index: self.change_source_language(self.source_combo.itemData(index)))
+        button_layout.addWidget(self.source_combo)
+        self.pair_combo = QComboBox()
+        self.pair_combo.currentTextChanged.connect(self.change_language_pair)
+        button_layout.addWidget(self.pair_combo)
+
+        # 翻译引擎选择
+        button_layout.addWidget(QLabel('翻译引擎:'))
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItems(list_engines(available_only=True) or ['MT'])
+        self.engine_combo.currentTextChanged.connect(self.change_translation_engine)
+        button_layout.addWidget(self.engine_combo)
+        
+        # 历史记录模式切换按钮和状态标签
+        button_layout.addWidget(QLabel('当前模式:'))
+        self.history_mode_button = QPushButton('逐句比对')
+        self.history_mode_button.clicked.connect(self.toggle_history_mode)
+        button_layout.addWidget(self.history_mode_button)
+        
+        button_layout.addStretch()
+        main_layout.addLayout(button_layout)
+        
+        # 创建主要内容区域
+        content_splitter = QSplitter(Qt.Horizontal)
+        content_splitter.setChildrenCollapsible(False)
+        
+        # 左侧区域
+        left_widget = QWidget()
+        left_layout = QVBoxLayout(left_widget)
+        left_layout.setContentsMargins(0, 0, 0, 0)
+        
+        # 创建左侧垂直分隔器
+        left_splitter = QSplitter(Qt.Vertical)
+        left_splitter.setChildrenCollapsible(False)
+        left_splitter.setHandleWidth(5)
+        
+        # 识别文本区域
+        original_widget = QWidget()
+        original_layout = QVBoxLayout(original_widget)
+        original_layout.setContentsMargins(0, 0, 0, 0)
+        self.original_text = QTextEdit()
+        self.original_text.setReadOnly(True)
+        self.original_text.setPlaceholderText('模型加载中...')
+        self.original_text.setStyleSheet(f'font-size: {self.font_sizes[self.current_font_size]}px;')
+        original_layout.addWidget(self.original_text)
+        left_splitter.addWidget(original_widget)
+        
+        # 翻译文本区域
+        translated_widget = QWidget()
+        translated_layout = QVBoxLayout(translated_widget)
+        translated_layout.setContentsMargins(0, 0, 0, 0)
+        self.translated_text = QTextEdit()
+        self.translated_text.setReadOnly(True)
+        self.translated_text.setPlaceholderText('等待翻译...')
+        self.translated_text.setStyleSheet(f'font-size: {self.font_sizes[self.current_font_size]}px;')
+        translated_layout.addWidget(self.translated_text)
+        left_splitter.addWidget(translated_widget)
+        
+        left_splitter.setSizes([300, 300])
+        left_layout.addWidget(left_splitter)
+        
+        # 右侧历史记录区域
+        history_widget = QWidget()
+        history_layout = QVBoxLayout(history_widget)
+        history_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.history_text = QTextEdit()
+        self.history_text.setReadOnly(True)
+        self.history_text.setStyleSheet(f'font-size: {self.font_sizes[self.current_font_size]}px;')
+        self.history_documents = {'sentence': QTextDocument(self), 'paragraph': QTextDocument(self)}
+        self.history_text.setDocument(self.history_documents[self.history_mode])
+        history_layout.addWidget(self.history_text)
+        
+        # 设置分割器
+        content_splitter.addWidget(left_widget)
+        content_splitter.addWidget(history_widget)
+        content_splitter.setSizes([500, 500])  # 设置左右两侧的初始大小
+        
+        main_layout.addWidget(content_splitter)
+
+    def change_source_language(self, lang):
+        # 新语言的模型在后台加载，加载完成前继续使用原来的识别语言
+        self.audio_processor.set_source_language(lang)
+        self.update_pair_combo(models.pair_for(lang, self.audio_processor.language_pair), lang)
+
+    def update_pair_combo(self, pair, lang=None):
+        self.pair_combo.blockSignals(True)
+        self.pair_combo.clear()
+        self.pair_combo.addItems(models.pairs_for(lang or self.audio_processor.source_lang) or [pair])
+        self.pair_combo.setCurrentText(pair)
+        self.pair_combo.blockSignals(False)
+
+    def change_language_pair(self, pair):
+        # 新语言对的模型在后台加载，加载完成后由 handle_language_changed 更新界面和记录
+        if pair and pair != self.audio_processor.language_pair:
+            self.audio_processor.set_language_pair(pair)
+
+    def handle_language_changed(self, lang, pair):
+        # 切换完成（或失败）后下拉框显示实际使用的语言，记录库中的会话语言随之更新
+        self.source_combo.blockSignals(True)
+        index = self.source_combo.findData(lang)
+        if index >= 0:
+            self.source_combo.setCurrentIndex(index)
+        self.source_combo.blockSignals(False)
+        self.update_pair_combo(pair, lang)
+        self.transcript_store.update_session(self.session_id, lang, models.pair_languages(pair)[1])
+
+    def language_labels(self):
+        # 历史记录和记录文件中原文与译文的标题，按当前语言对显示
+        return models.pair_labels(self.audio_processor.language_pair)
+
+    def change_translation_engine(self, engine):
+        self.audio_processor.set_translation_engine(engine)
+
+    def change_font_size(self, size):
+        self.current_font_size = size
+        font_size = self.font_sizes[size]
+        
+        # 更新实时显示的文本字体大小
+        for widget in [self.original_text, self.translated_text, self.history_text]:
+            widget.setStyleSheet(f'font-size: {font_size}px;')
+        # 未显示的历史文档也同步字体
+        for document in self.history_documents.values():
+            document.setDefaultFont(self.history_text.font())
+
+    def closeEvent(self, event):
+        self.audio_processor.stop()
+        self.stream.stop_stream()
+        self.stream.close()
+        self.p.terminate()
+        self.audio_thread.join()
+        # 写出剩余的记录和最终的全文文件
+        self.transcript_writer.close()
+        self.transcript_store.end_session(self.session_id)
+        self.transcript_store.close()
+        event.accept()
+
+    def clear_text(self):
+        self.original_old = ""
+        self.original_new = ""
+        self.translated_old = ""
+        self.translated_new = ""
+        self.original_text.setText('等待语音输入...')
+        self.translated_text.setText('等待翻译...')
+        self.audio_processor.clear_history()
+        self.history_sources.clear()
+        self.history_targets.clear()
+        for document in self.history_documents.values():
+            document.clear()
+
+    def isolated_models_loaded(self, error):
+        # 在预加载线程中调用
+        if error is None:
+            try:
+                self.audio_processor.recognizer.wait_ready()
+            except Exception as e:
+                error = e
+        self.signals.models_ready.emit(str(error) if error else '')
+
+    def setup_audio_processor(self):
+        self.audio_processor = AudioProcessor(name=self.stream_name, translation_pool=self.translation_pool,
+                                              **self.audio_options)
+        self.signals = ProcessorSignals(self.audio_processor)
+        self.signals.text_ready.connect(self.update_original_text)
+        self.signals.translation_ready.connect(self.update_translated_text)
+        self.audio_processor.is_running = True  # 确保is_running为True
+        self.audio_thread = threading.Thread(target=self.audio_processor.process_audio)
+        self.audio_thread.start()
+
+        self.p = pyaudio.PyAudio()
+        device_index = find_input_device(self.p, self.device)
+        if device_index is not None and self.stream_name:
+            self.setWindowTitle(f"实时字幕与翻译 - {self.p.get_device_info_by_index(device_index)['name']}")
+
+        self.stream = self.p.open(
+            format=pyaudio.paInt16,
+            channels=self.audio_processor.channels,
+            rate=16000,
+            input=True,
+            input_device_index=device_index,
+            frames_per_buffer=self.audio_processor.frames_per_buffer,
+            stream_callback=self.audio_processor.audio_callback
+        )
+        self.stream.start_stream()
+
+    def show_font_menu(self):
+        menu = QMenu(self)
+        for size in self.font_sizes.keys():
+            action = QAction(size, self)
+            action.triggered.connect(lambda checked, s=size: self.change_font_size(s))
+            menu.addAction(action)
+        menu.exec_(self.font_button.mapToGlobal(self.font_button.rect().bottomLeft()))
+
+    def toggle_start(self, checked):
+        if checked:
+            self.audio_processor.resume()
+            self.start_button.setText('开始')
+        else:
+            self.audio_processor.pause()
+            self.start_button.setText('暂停')
+
+    def toggle_history(self, checked):
+        self.show_history = checked
+        content_splitter = self.centralWidget().findChild(QSplitter)
+        content_splitter.widget(1).setVisible(checked)
+        if checked:
+            self.update_history_display()
+
+    def toggle_history_mode(self):
+        self.history_mode = 'paragraph' if self.history_mode == 'sentence' else 'sentence'
+        self.history_mode_button.setText('逐句比对' if self.history_mode == 'sentence' else '全文翻译')
+        # 两种模式的文档都是增量维护的，切换时只需更换显示的文档
+        self.history_text.setDocument(self.history_documents[self.history_mode])
+        self.history_text.document().setDefaultFont(self.history_text.font())
+        self.scroll_history_to_bottom()
+        
+    def toggle_pin(self, checked):
+        if checked:
+            self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
+            self.pin_button.setText('取消置顶')
+        else:
+            self.setWindowFlags(self.windowFlags() & ~Qt.WindowStaysOnTopHint)
+            self.pin_button.setText('置顶')
+        self.show()
+
+    def append_history(self, text, translation):
+        # 获取当前滚动条位置
+        scroll_bar = self.history_text.verticalScrollBar()
+        was_at_bottom = scroll_bar.value() == scroll_bar.maximum()
+
+        self.history_sources.append(text)
+        self.history_targets.append(translation)
+
+        # 逐句模式：在文档末尾追加新的一组句子
+        source_label, target_label = self.language_labels()
+        cursor = QTextCursor(self.history_documents['sentence'])
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(f'{source_label}:\n{text}\n{target_label}:\n{translation}\n-------------------\n\n')
+
+        # 整段模式：原文追加到第二段末尾，译文追加到文档末尾
+        document = self.history_documents['paragraph']
+        cursor = QTextCursor(document)
+        if document.isEmpty():
+            cursor.insertText(f'{source_label}:\n{text}\n{target_label}:\n{translation}')
+        else:
+            cursor = QTextCursor(document.findBlockByNumber(1))
+            cursor.movePosition(QTextCursor.EndOfBlock)
+            cursor.insertText(' ' + text)
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText(' ' + translation)
+
+        # 如果之前在底部，则保持在底部
+        if was_at_bottom:
+            self.scroll_history_to_bottom()
+
+    def update_history_display(self):
+        # 根据已保存的句子完整重建两个历史文档（仅在需要全量刷新时使用）
+        sources, targets = list(self.history_sources), list(self.history_targets)
+        self.history_sources.clear()
+        self.history_targets.clear()
+        for document in self.history_documents.values():
+            document.clear()
+        for text, translation in zip(sources, targets):
+            self.append_history(text, translation)
+        self.scroll_history_to_bottom()
+
+    def scroll_history_to_bottom(self):
+        self.history_text.verticalScrollBar().setValue(
+            self.history_text.verticalScrollBar().maximum()
+        )
+
+    def handle_models_ready(self, error):
+        if error:
+            self.original_text.setPlaceholderText(f'模型加载失败: {error}')
+        else:
+            self.original_text.setPlaceholderText('等待语音输入...')
+
+    def update_original_text(self, text, emit_time=None):
+        # 更新实时文本
+        self.original_new = text
+        # 显示组合文本：历史文本 + 新文本（如果有）
+        display_text = ""
+        if self.original_new:
+            display_text = display_text + '\n' + self.original_new if display_text else self.original_new
+        self.original_text.setText(display_text)
+        # 自动滚动到底部
+        self.original_text.verticalScrollBar().setValue(
+            self.original_text.verticalScrollBar().maximum()
+        )
+        if emit_time is not None:
+            metrics.observe('render_seconds', time.monotonic() - emit_time, {'view': 'original'})
+
+    def update_translated_text(self, text, skipped=0, emit_time=None):
+        # 更新实时译文
+        self.translated_new = text
+        # 显示组合文本：历史译文 + 新译文（如果有）
+        display_text = ""
+        if self.translated_new:
+            display_text = display_text + '\n' + self.translated_new if display_text else self.translated_new
+        self.translated_text.setText(display_text)
+        # 自动滚动到底部
+        self.translated_text.verticalScrollBar().setValue(
+            self.translated_text.verticalScrollBar().maximum()
+        )
+        if emit_time is not None:
+            metrics.observe('render_seconds', time.monotonic() - emit_time, {'view': 'translated'})
+
+    def init_auto_save_file(self):
+        # 初始化自动保存文件
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if self.stream_name:
+            # 多路输入同时开始时按输入区分记录文件
+            timestamp = f'{timestamp}_{self.stream_name}'
+        # 使用绝对路径
+        record_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'record')
+        # 确保record文件夹存在
+        os.makedirs(record_dir, exist_ok=True)
+        
+        self.auto_save_file_sentence = os.path.join(record_dir, f'record_sentence_{timestamp}.txt')
+        self.auto_save_file_fulltext = os.path.join(record_dir, f'record_fulltext_{timestamp}.txt')
+
+        try:
+            # 创建文件并写入初始内容
+            with open(self.auto_save_file_sentence, 'w', encoding='utf-8') as f:
+                f.write(f"=== 实时字幕与翻译记录 ===\n开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+                f.flush()
+        except Exception as e:
+            print(f"创建自动保存文件失败: {str(e)}")
+            # 如果创建失败，尝试使用临时文件名
+            self.auto_save_file_sentence = os.path.join(record_dir, f'实时字幕与翻译_backup_{timestamp}.txt')
+            with open(self.auto_save_file_sentence, 'w', encoding='utf-8') as f:
+                f.write(f"=== 实时字幕与翻译记录（备份）===\n开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+                f.flush()
+        try:
+            # 创建文件并写入初始内容
+            with open(self.auto_save_file_fulltext, 'w', encoding='utf-8') as f:
+                f.write(f"=== 实时字幕与翻译记录 ===\n开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+                f.flush()
+        except Exception as e:
+            print(f"创建自动保存文件失败: {str(e)}")
+            # 如果创建失败，尝试使用临时文件名
+            self.auto_save_file_fulltext = os.path.join(record_dir, f'实时字幕与翻译_backup_{timestamp}.txt')
+            with open(self.auto_save_file_fulltext, 'w', encoding='utf-8') as f:
+                f.write(f"=== 实时字幕与翻译记录（备份）===\n开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+                f.flush()
+        # 记录在后台线程中批量追加写入，界面线程只负责入队
+        self.transcript_writer = TranscriptWriter(self.auto_save_file_sentence, self.auto_save_file_fulltext).start()
+        # 结构化记录库，所有会话保存在同一个数据库中，便于检索和导出
+        self.transcript_store = TranscriptStore(os.path.join(record_dir, 'transcripts.db'))
+        self.session_id = self.transcript_store.start_session(
+            self.audio_processor.source_lang, models.pair_languages(self.audio_processor.language_pair)[1],
+            f'record_{timestamp}')
+        self.audio_processor.attach_store(self.transcript_store, self.session_id)
+
+    def handle_sentence_finished(self, original, translated):
+        # 将完整句子添加到历史记录
+        # 清空实时部分
+        self.original_new = ""
+        self.translated_new = ""
+        
+    
+        # 更新显示为当前识别的文本
+        self.original_text.setText(original)
+        self.translated_text.setText(translated)
+        # 历史记录由 history_added 信号增量追加
+
+        # 避免显示重复的识别结果
+        if original != self.original_old and translated != self.translated_old:
+            # 自动保存到文件（后台线程追加写入逐句文件，全文文件在关闭时写出）
+            self.transcript_writer.append(original, translated, labels=self.language_labels())
+
+        # 记录当前结果，避免显示重复的识别结果
+        self.original_old = original
+        self.translated_old = translated
+
+def main():
+    parser = argparse.ArgumentParser(description='实时字幕与翻译')
+    parser.add_argument('--metrics-port', type=int, help='在该端口提供 Prometheus 指标 (/metrics)')
+    parser.add_argument('--metrics-log', help='定期将指标快照追加到该 JSONL 文件')
+    parser.add_argument('--metrics-interval', type=float, default=10.0)
+    parser.add_argument('--device', action='append', default=[],
+                        help='输入设备编号或名称的一部分，可重复指定以同时识别多路输入')
+    parser.add_argument('--list-devices', action='store_true', help='列出可用的输入设备后退出')
+    parser.add_argument('--translation-workers', type=int, help='多路输入共享的翻译线程数')
+    parser.add_argument('--frames-per-buffer', type=int, default=8000,
+                        help='每次音频回调的帧数（16 kHz 下 8000 为 500 毫秒），越小延迟越低、开销越大')
+    parser.add_argument('--audio-buffer-seconds', type=float, default=10.0, help='音频环形缓冲区的时长')
+    parser.add_argument('--catch-up', choices=['drop_oldest', 'fast_forward'], default='drop_oldest',
+                        help='识别跟不上时的处理：丢弃被覆盖的最旧音频，或积压超过 --max-backlog 秒时跳到最新音频')
+    parser.add_argument('--max-backlog', type=float, default=2.0)
+    parser.add_argument('--serve-port', type=int, help='在该端口通过 SSE / WebSocket 向浏览器广播字幕')
+    parser.add_argument('--serve-host', default='127.0.0.1', help='广播服务监听的地址，局域网观看时设为 0.0.0.0')
+    parser.add_argument('--isolate', action='store_true',
+                        help='识别器和翻译引擎在独立的子进程中运行，推理不与界面争用 GIL，子进程崩溃后自动重启')
+    parser.add_argument('--engine-processes', type=int, default=1, help='隔离模式下每个翻译引擎的进程数')
+    args, qt_args = parser.parse_known_args()
+    if args.list_devices:
+        p = pyaudio.PyAudio()
+        for i, dev in list_input_devices(p):
+            print(f"{i}\t{dev['name']}\t{dev['maxInputChannels']} 声道")
+        p.terminate()
+        return
+    exporters = []
+    if args.metrics_port:
+        exporters.append(PrometheusExporter(port=args.metrics_port).start())
+    if args.metrics_log:
+        exporters.append(JsonlExporter(args.metrics_log, interval=args.metrics_interval).start())
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    audio_options = {'frames_per_buffer': args.frames_per_buffer, 'buffer_seconds': args.audio_buffer_seconds,
+                     'catch_up': args.catch_up, 'max_backlog': args.max_backlog}
+    if args.isolate:
+        isolate_engines(processes=args.engine_processes)
+        audio_options['isolate'] = True
+    translation_pool = None
+    if len(args.device) > 1:
+        # 多路输入：每路一个窗口，翻译请求在共享线程池中轮询调度
+        translation_pool = TranslationPool(args.translation_workers).start()
+        windows = [SubtitleWindow(device, translation_pool, f'input{i}', audio_options)
+                   for i, device in enumerate(args.device)]
+    else:
+        windows = [SubtitleWindow(args.device[0] if args.device else None, audio_options=audio_options)]
+    server = None
+    if args.serve_port:
+        server = SubtitleServer(args.serve_host, args.serve_port).start()
+        for window in windows:
+            server.attach(window.audio_processor, window.stream_name)
+        print(f'字幕广播服务: http://{args.serve_host}:{server.port}/')
+    for window in windows:
+        window.show()
+    code = app.exec_()
+    if server is not None:
+        server.stop()
+    if translation_pool is not None:
+        translation_pool.stop()
+    for exporter in exporters:
+        exporter.stop()
+    stop_workers()
+    sys.exit(code)
@@ -0,0 +1,137 @@
+# 暂停时 AudioProcessor 的空闲CPU占用（假音频源驱动真实的处理线程）；对比旧版与新版每个音频块的内存分配；
+# 对比 queue.Queue 与环形缓冲区在识别卡顿时的内存与积压延迟，以及不同 frames_per_buffer 的每秒开销
+# 用法: python benchmarks/bench_audio_path.py [--seconds 2] [--chunks 2000] [--stall 30]
+import argparse, json, os, queue, sys, threading, time, tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FRAMES_PER_BUFFER = 8000
+SAMPLE_RATE = 16000
+
+def legacy_convert(audio_data):
+    # 旧版: frombuffer -> reshape -> astype -> tobytes，单声道时也会拷贝两次
+    pcm_data = np.frombuffer(audio_data, dtype=np.int16)
+    if pcm_data.ndim > 1:
+        pcm_data = pcm_data.mean(axis=1).astype(np.int16)
+    else:
+        pcm_data = pcm_data.reshape(-1, 1)[:, 0].astype(np.int16)
+    return pcm_data.tobytes()
+
+def current_convert(audio_data, channels=1):
+    # 新版: 单声道直接使用原始缓冲区
+    if channels > 1:
+        pcm_data = np.frombuffer(audio_data, dtype=np.int16).reshape(-1, channels)
+        audio_data = pcm_data.mean(axis=1).astype(np.int16).tobytes()
+    return audio_data
+
+def measure_allocations(convert, chunks):
+    audio_data = np.random.randint(-2000, 2000, FRAMES_PER_BUFFER, dtype=np.int16).tobytes()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(chunks):
+        convert(audio_data)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size for stat in snapshot.statistics('filename'))
+    return {
+        'us_per_chunk': elapsed / chunks * 1e6,
+        'peak_bytes': peak,
+        'retained_bytes': allocated,
+    }
+
+def measure_idle_cpu(seconds):
+    # 暂停状态下的真实 AudioProcessor：假音频源按实时速度调用 audio_callback（与暂停时仍在采集的 PyAudio 流相同），
+    # 处理线程应阻塞在 wait_until_active 中，统计这段时间整个进程的 CPU 占用
+    from subtitle_engine import AudioProcessor
+
+    processor = AudioProcessor(vad=None)
+    thread = threading.Thread(target=processor.process_audio, daemon=True)
+    thread.start()
+    block = np.zeros(FRAMES_PER_BUFFER, dtype=np.int16).tobytes()
+    chunk_seconds = FRAMES_PER_BUFFER / SAMPLE_RATE
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    chunks = 0
+    while time.perf_counter() - wall_start < seconds:
+        processor.audio_callback(block, FRAMES_PER_BUFFER, None, None)
+        chunks += 1
+        # 与开始时间对齐，避免误差累积
+        delay = wall_start + chunks * chunk_seconds - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    backlog = processor.audio_buffer.backlog()
+    processor.stop()
+    thread.join()
+    return {'cpu_seconds': cpu, 'cpu_percent': cpu / wall * 100, 'chunks': chunks,
+            'buffered_frames': backlog}
+
+def measure_stall(stall_seconds):
+    # 识别线程卡住 stall_seconds 秒（音频持续写入）后恢复，比较缓冲占用的内存和下一块音频的积压延迟
+    from subtitle_engine.ringbuffer import AudioRingBuffer
+
+    block = np.zeros(FRAMES_PER_BUFFER, dtype=np.int16)
+    blocks = int(stall_seconds * SAMPLE_RATE / FRAMES_PER_BUFFER)
+    results = {}
+    tracemalloc.start()
+    audio_queue = queue.Queue()
+    for _ in range(blocks):
+        # 与旧版回调相同：每块是 PortAudio 新分配的 bytes 对象
+        audio_queue.put((time.monotonic(), block.tobytes()))
+    results['queue'] = {'buffered_bytes': tracemalloc.get_traced_memory()[0],
+                        'backlog_seconds': audio_queue.qsize() * FRAMES_PER_BUFFER / SAMPLE_RATE,
+                        'dropped_seconds': 0.0}
+    tracemalloc.stop()
+    for policy, max_backlog in (('drop_oldest', None), ('fast_forward', 2 * SAMPLE_RATE)):
+        tracemalloc.start()
+        buffer = AudioRingBuffer(10 * SAMPLE_RATE)
+        for _ in range(blocks):
+            buffer.write(block.tobytes())
+        _, dropped, behind = buffer.read(FRAMES_PER_BUFFER, 0, max_backlog)
+        results[policy] = {'buffered_bytes': tracemalloc.get_traced_memory()[0],
+                           'backlog_seconds': (behind + FRAMES_PER_BUFFER) / SAMPLE_RATE,
+                           'dropped_seconds': dropped / SAMPLE_RATE}
+        tracemalloc.stop()
+    return results
+
+def measure_frames_per_buffer(seconds=60):
+    # 写入并读出 seconds 秒音频的耗时：块越小，回调和识别循环的调用次数越多
+    from subtitle_engine.ringbuffer import AudioRingBuffer
+
+    results = {}
+    for frames in (800, 1600, 4000, 8000):
+        buffer = AudioRingBuffer(10 * SAMPLE_RATE)
+        block = np.zeros(frames, dtype=np.int16).tobytes()
+        count = seconds * SAMPLE_RATE // frames
+        start = time.perf_counter()
+        for _ in range(count):
+            buffer.write(block)
+            buffer.read(frames, 0)
+        elapsed = time.perf_counter() - start
+        results[frames] = {'block_ms': frames / SAMPLE_RATE * 1000, 'us_per_block': elapsed / count * 1e6,
+                           'us_per_audio_second': elapsed / seconds * 1e6}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--chunks', type=int, default=2000)
+    parser.add_argument('--stall', type=float, default=30.0, help='模拟识别卡顿的秒数')
+    args = parser.parse_args()
+    results = {
+        'idle_cpu': measure_idle_cpu(args.seconds),
+        'per_chunk': {
+            'legacy': measure_allocations(legacy_convert, args.chunks),
+            'current': measure_allocations(current_convert, args.chunks),
+        },
+        'stall': measure_stall(args.stall),
+        'frames_per_buffer': measure_frames_per_buffer(),
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
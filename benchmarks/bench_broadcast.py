@@ -0,0 +1,181 @@
+# 字幕广播服务压测：在另一个进程中打开数百个 SSE / WebSocket 客户端（另有一些只连接不读取的慢客户端），
+# 由模拟识别线程按固定频率发布字幕，统计送达延迟、慢客户端的丢弃数、回放接口，
+# 以及识别线程每步耗时在有无客户端时的差异（发布只是一次线程安全的投递，不应拖慢识别）
+# 用法: python benchmarks/bench_broadcast.py [--clients 400] [--slow 20] [-o result.json]
+import argparse, asyncio, base64, json, os, socket, subprocess, sys, threading, time, urllib.request
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from stats import percentiles
+
+async def sse_client(port, results):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    while await reader.readline() not in (b'\r\n', b''):
+        pass
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        if line.startswith(b'data: '):
+            if results(json.loads(line[6:])):
+                writer.close()
+                return
+
+async def ws_client(port, results):
+    from subtitle_engine.server import read_websocket_frame
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(f'GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                 f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n'.encode())
+    while await reader.readline() not in (b'\r\n', b''):
+        pass
+    while True:
+        opcode, payload = await read_websocket_frame(reader)
+        if opcode == 0x8:
+            return
+        if opcode == 0x1 and results(json.loads(payload)):
+            # 客户端发出的帧需要加掩码，掩码全为 0 时内容不变
+            writer.write(bytes([0x88, 0x82, 0, 0, 0, 0, 0x03, 0xE8]))
+            await writer.drain()
+            writer.close()
+            return
+
+class Collector:
+    # 记录一个客户端收到的消息数、送达延迟和偏移量不连续（被丢弃）的次数，收到 end 后返回 True
+    def __init__(self, latencies):
+        self.latencies = latencies
+        self.received = 0
+        self.gaps = 0
+        self.last = None
+
+    def __call__(self, event):
+        if event['type'] == 'end':
+            return True
+        self.latencies.append(time.time() - event['time'])
+        if self.last is not None and event['offset'] != self.last + 1:
+            self.gaps += 1
+        self.last = event['offset']
+        self.received += 1
+        return False
+
+async def run_clients(port, count, ws_fraction, slow, timeout):
+    latencies = []
+    collectors = [Collector(latencies) for _ in range(count)]
+
+    # 慢客户端：接收缓冲区很小并且从不读取，服务端的写入很快堵住，只能丢弃积压的旧消息
+    slow_sockets = []
+    for _ in range(slow):
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect(('127.0.0.1', port))
+        sock.sendall(b'GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        slow_sockets.append(sock)
+    ws_count = int(count * ws_fraction)
+    tasks = [(ws_client if i < ws_count else sse_client)(port, collector) for i, collector in enumerate(collectors)]
+    print('ready', flush=True)
+    done = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout)
+    errors = [repr(result) for result in done if isinstance(result, Exception)]
+    for sock in slow_sockets:
+        sock.close()
+    return {'clients': count, 'websocket_clients': ws_count, 'sse_clients': count - ws_count,
+            'slow_clients': slow, 'errors': errors[:5], 'error_count': len(errors),
+            'events_received_per_client': percentiles([collector.received for collector in collectors]),
+            'sequence_gaps': sum(collector.gaps for collector in collectors),
+            'delivery_latency_seconds': percentiles(latencies)}
+
+def recognition_loop(server, rate, seconds, payload, step_times, publish_times, work):
+    # 模拟识别线程：每步做固定的计算量，然后发布部分结果，每 5 步发布一次整句和译文
+    samples = np.random.default_rng(0).standard_normal(8000).astype(np.float32)
+    text = ('lorem ipsum ' * (payload // 12 + 1))[:payload]
+    interval = 1.0 / rate
+    next_step = time.perf_counter()
+    for step in range(int(rate * seconds)):
+        start = time.perf_counter()
+        for _ in range(work):
+            np.fft.rfft(samples)
+        publish_start = time.perf_counter()
+        server.publish('text', text=f'{step} {text}')
+        if step % 5 == 4:
+            server.publish('translation', translation=f'{step} 译文')
+            server.publish('sentence', text=f'{step} {text}', translation=f'{step} 译文')
+        end = time.perf_counter()
+        publish_times.append(end - publish_start)
+        step_times.append(end - start)
+        next_step += interval
+        time.sleep(max(0.0, next_step - time.perf_counter()))
+
+def run_phase(server, args):
+    step_times, publish_times = [], []
+    thread = threading.Thread(target=recognition_loop,
+                              args=(server, args.rate, args.seconds, args.payload, step_times, publish_times,
+                                    args.work))
+    thread.start()
+    thread.join()
+    return {'step_seconds': percentiles(step_times), 'publish_seconds': percentiles(publish_times)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=400, help='正常读取的客户端数')
+    parser.add_argument('--ws-fraction', type=float, default=0.5, help='其中使用 WebSocket 的比例')
+    parser.add_argument('--slow', type=int, default=20, help='只连接不读取的慢客户端数')
+    parser.add_argument('--rate', type=float, default=20.0, help='每秒发布的部分结果数')
+    parser.add_argument('--seconds', type=float, default=20.0)
+    parser.add_argument('--payload', type=int, default=8000,
+                        help='每条字幕的字符数；慢客户端要先填满内核的发送缓冲区（约数 MB）才会开始丢弃')
+    parser.add_argument('--buffer-size', type=int, default=64, help='每个客户端的缓冲区大小')
+    parser.add_argument('--work', type=int, default=20, help='模拟识别线程每步的计算量')
+    parser.add_argument('--client-port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('-o', '--output', help='把结果写入该 JSON 文件')
+    args = parser.parse_args()
+
+    if args.client_port:
+        # 客户端子进程：与服务端分开进程，避免客户端的解析占用服务端和识别线程的 GIL
+        result = asyncio.run(run_clients(args.client_port, args.clients, args.ws_fraction, args.slow,
+                                         args.seconds * 3 + 30))
+        print(json.dumps(result))
+        return
+
+    from subtitle_engine import MetricsRegistry, SubtitleServer
+
+    server = SubtitleServer(port=0, buffer_size=args.buffer_size, write_timeout=args.seconds * 3,
+                            metrics=MetricsRegistry()).start()
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'config': {
+        key: value for key, value in vars(args).items() if key not in ('client_port', 'output')}}
+    report['without_clients'] = run_phase(server, args)
+
+    command = [sys.executable, os.path.abspath(__file__), '--client-port', str(server.port),
+               '--clients', str(args.clients), '--ws-fraction', str(args.ws_fraction), '--slow', str(args.slow),
+               '--seconds', str(args.seconds)]
+    clients = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    clients.stdout.readline()
+    deadline = time.monotonic() + 30
+    while server.get_stats()['clients'] < args.clients + args.slow and time.monotonic() < deadline:
+        time.sleep(0.05)
+    report['connected'] = server.get_stats()['clients']
+    start_offset = server.offset
+    report['with_clients'] = run_phase(server, args)
+    server.publish('end')
+    report['clients'] = json.loads(clients.communicate()[0].strip().splitlines()[-1])
+    report['server'] = server.get_stats()
+
+    # 回放：从本轮开始的偏移量起取 100 条，检查偏移量连续
+    url = f'http://127.0.0.1:{server.port}/replay?offset={start_offset}&limit=100'
+    with urllib.request.urlopen(url) as response:
+        replayed = json.loads(response.read())
+    offsets = [event['offset'] for event in replayed]
+    report['replay'] = {'count': len(replayed), 'contiguous': offsets == list(range(start_offset + 1,
+                                                                                        start_offset + 101))}
+    server.stop()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+if __name__ == '__main__':
+    main()
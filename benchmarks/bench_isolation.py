@@ -0,0 +1,236 @@
+# 进程隔离验证：用纯 Python 计算模拟识别与 generate 中持有 GIL 的部分，比较推理在线程中和在子进程中运行时
+# 模拟界面线程（每 10 毫秒一次定时器）的延迟与推理吞吐；另外检查每块音频经共享内存往返的开销，
+# 以及识别进程、翻译进程崩溃后的自动重启和回退到备用引擎
+# 用法: python benchmarks/bench_isolation.py [--seconds 5] [--threads 2] [-o result.json]
+import argparse, json, os, sys, threading, time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from stats import percentiles
+from subtitle_engine.engines import TranslationEngine
+
+CRASH_CHUNK = b'\xff\xff' * 4
+
+def burn(work):
+    # 持有 GIL 的纯 Python 计算
+    total = 0
+    for i in range(work):
+        total += i * i
+    return total
+
+class BurnEngine(TranslationEngine):
+    # 每条文本做固定量的 Python 计算；crash=True 时遇到文本 crash 直接退出进程，模拟原生库崩溃
+    batching = True
+
+    def __init__(self, name, work=200000, fallback=None, crash=False):
+        super().__init__(name, fallback)
+        self.work = work
+        self.crash = crash
+
+    def translate_batch(self, texts, pair=None):
+        results = []
+        for text in texts:
+            if self.crash and text == 'crash':
+                os._exit(1)
+            burn(self.work)
+            results.append(f'译文 {text}')
+        return results
+
+class BurnRecognizer:
+    # 与 KaldiRecognizer 接口相同的桩：每块音频做 work 次计算，每 4 块给出一次完整结果
+    def __init__(self, work):
+        self.work = work
+        self.count = 0
+
+    def SetWords(self, words):
+        pass
+
+    def AcceptWaveform(self, data):
+        if data[:len(CRASH_CHUNK)] == CRASH_CHUNK:
+            os._exit(1)
+        burn(self.work)
+        self.count += 1
+        return self.count % 4 == 0
+
+    def Result(self):
+        return json.dumps({'text': f'sentence {self.count}'})
+
+    def PartialResult(self):
+        return json.dumps({'partial': f'partial {self.count}'})
+
+    def FinalResult(self):
+        return json.dumps({'text': ''})
+
+class RecognizerFactory:
+    # 需要能被 pickle 传给子进程
+    def __init__(self, work):
+        self.work = work
+
+    def __call__(self, lang, sample_rate):
+        return BurnRecognizer(self.work)
+
+def ui_loop(stop, lateness, interval=0.01):
+    # 模拟 Qt 定时器：记录每次唤醒比预期晚了多少（包括等待 GIL），然后做一点界面工作
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        time.sleep(interval)
+        lateness.append(time.perf_counter() - expected)
+        burn(2000)
+
+def run_load(mode, args):
+    # mode='thread': 识别与翻译在本进程的线程中；mode='process': 在子进程中
+    from subtitle_engine.workers import ProcessEngine, RecognizerProcess
+
+    chunk = np.zeros(args.frames, dtype=np.int16).tobytes()
+    engine = BurnEngine('burn', args.translate_work)
+    factory = RecognizerFactory(args.recognize_work)
+    if mode == 'process':
+        engine = ProcessEngine(engine, processes=args.threads)
+        recognizer = RecognizerProcess('english', factory=factory).wait_ready()
+        engine.load()
+    else:
+        recognizer = factory('english', 16000)
+    stop = threading.Event()
+    counts = {'chunks': 0, 'translations': 0}
+
+    def recognize():
+        while not stop.is_set():
+            recognizer.AcceptWaveform(chunk)
+            recognizer.PartialResult()
+            counts['chunks'] += 1
+
+    def translate(index):
+        step = 0
+        while not stop.is_set():
+            engine.translate_batch([f'{index} {step}'])
+            counts['translations'] += 1
+            step += 1
+
+    lateness = []
+    threads = [threading.Thread(target=ui_loop, args=(stop, lateness)), threading.Thread(target=recognize)]
+    threads += [threading.Thread(target=translate, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    result = {'ui_timer_lateness': percentiles(lateness, 1000, '_ms'),
+              'chunks_per_second': counts['chunks'] / elapsed,
+              'translations_per_second': counts['translations'] / elapsed,
+              'main_process_cpu_seconds': time.process_time() - cpu_start}
+    if mode == 'process':
+        recognizer.close()
+        engine.stop()
+    return result
+
+def measure_round_trip(frames, chunks=500):
+    # 每块音频经共享内存送入识别进程并取回结果的耗时（识别本身不做计算）
+    from subtitle_engine.workers import RecognizerProcess
+
+    chunk = np.zeros(frames, dtype=np.int16).tobytes()
+    factory = RecognizerFactory(0)
+    results = {}
+    local = factory('english', 16000)
+    recognizer = RecognizerProcess('english', factory=factory).wait_ready()
+    for name, target in (('in_process', local), ('worker_process', recognizer)):
+        start = time.perf_counter()
+        for _ in range(chunks):
+            target.AcceptWaveform(chunk)
+            target.PartialResult()
+        results[name] = {'us_per_chunk': (time.perf_counter() - start) / chunks * 1e6}
+    recognizer.close()
+    return results
+
+def measure_recognizer_crash():
+    # 识别进程崩溃：该块没有结果，之后在后台重启，重启期间的音频块立即返回（跳过），就绪后继续识别
+    from subtitle_engine.workers import RecognizerProcess
+
+    recognizer = RecognizerProcess('english', factory=RecognizerFactory(0)).wait_ready()
+    chunk = np.zeros(8000, dtype=np.int16).tobytes()
+    before = [recognizer.AcceptWaveform(chunk) for _ in range(4)]
+    start = time.perf_counter()
+    crashed = recognizer.AcceptWaveform(CRASH_CHUNK + chunk)
+    crash_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    skipped = recognizer.AcceptWaveform(chunk)
+    skip_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    recognizer.wait_ready()
+    restart_seconds = time.perf_counter() - start
+    after = recognizer.AcceptWaveform(chunk)
+    result = {'results_before_crash': before, 'crash_chunk_result': crashed, 'crash_detect_seconds': crash_seconds,
+              'restarting_chunk_result': skipped, 'restarting_chunk_seconds': skip_seconds,
+              'restart_seconds': restart_seconds, 'result_after_restart': after,
+              'partial_after_restart': json.loads(recognizer.PartialResult()),
+              'worker': recognizer.worker.get_stats()}
+    recognizer.close()
+    return result
+
+def measure_engine_crash():
+    # 翻译进程崩溃：本次请求改用备用引擎，之后的请求在重启的进程中继续
+    from subtitle_engine.engines import EngineUnavailable, engines, register_engine
+    from subtitle_engine.translation import translate_batch
+    from subtitle_engine.workers import ProcessEngine
+
+    saved = dict(engines)
+    register_engine(BurnEngine('echo', 0))
+    engine = register_engine(ProcessEngine(BurnEngine('crashy', 0, fallback='echo', crash=True)))
+    try:
+        result = {'first': translate_batch(['hello'], 'crashy')}
+        start = time.perf_counter()
+        result['crash_with_fallback'] = translate_batch(['crash'], 'crashy')
+        result['crash_seconds'] = time.perf_counter() - start
+        start = time.perf_counter()
+        result['after_restart'] = translate_batch(['world'], 'crashy')
+        result['restart_seconds'] = time.perf_counter() - start
+        # 连续崩溃 3 次后熔断，之后直接拒绝而不是反复重启
+        for _ in range(4):
+            try:
+                engine.translate_batch(['crash'])
+            except EngineUnavailable as e:
+                result['last_error'] = str(e)
+        result['worker'] = engine.get_stats()
+    finally:
+        engine.stop()
+        engines.clear()
+        engines.update(saved)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--threads', type=int, default=2, help='翻译线程数（隔离模式下同时为翻译进程数）')
+    parser.add_argument('--frames', type=int, default=8000)
+    parser.add_argument('--recognize-work', type=int, default=100000, help='每块音频的模拟计算量')
+    parser.add_argument('--translate-work', type=int, default=300000, help='每条翻译的模拟计算量')
+    parser.add_argument('-o', '--output', help='把结果写入该 JSON 文件')
+    args = parser.parse_args()
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'cpus': os.cpu_count(),
+              'config': {key: value for key, value in vars(args).items() if key != 'output'}}
+    stop = threading.Event()
+    lateness = []
+    idle = threading.Thread(target=ui_loop, args=(stop, lateness))
+    idle.start()
+    time.sleep(min(args.seconds, 2.0))
+    stop.set()
+    idle.join()
+    report['idle'] = {'ui_timer_lateness': percentiles(lateness, 1000, '_ms')}
+    report['thread'] = run_load('thread', args)
+    report['process'] = run_load('process', args)
+    report['round_trip'] = measure_round_trip(args.frames)
+    report['recognizer_crash'] = measure_recognizer_crash()
+    report['engine_crash'] = measure_engine_crash()
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+if __name__ == '__main__':
+    main()
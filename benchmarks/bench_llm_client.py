@@ -0,0 +1,134 @@
+# LLM 客户端验证：在本机启动一个模拟 Ollama /api/chat 的桩服务，分别模拟正常、首字过慢、卡死、
+# 偶发错误和持续故障，检查 LLMClient 的截止时间、重试、熔断、并发上限以及回退到 MT 的行为
+# 用法: python benchmarks/bench_llm_client.py [-o result.json]
+import argparse, json, os, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+class StubOllama(BaseHTTPRequestHandler):
+    # 请求中的 model 字段决定行为: ok / slow / hang / flaky / late_error / down
+    protocol_version = 'HTTP/1.1'
+    calls = {}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        scenario = body.get('model', 'ok')
+        with self.lock:
+            count = self.calls[scenario] = self.calls.get(scenario, 0) + 1
+        if scenario == 'late_error' and count % 2 == 1:
+            time.sleep(0.9)
+        if scenario == 'down' or (scenario == 'flaky' and count % 3 != 0) or (scenario == 'late_error' and count % 2):
+            error = json.dumps({'error': 'stub failure'}).encode('utf-8')
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(error)))
+            self.end_headers()
+            self.wfile.write(error)
+            return
+        if scenario == 'hang':
+            time.sleep(60)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        if scenario == 'slow':
+            time.sleep(1.5)
+        elif scenario == 'late_error':
+            time.sleep(0.3)
+        text = '译文：' + body['messages'][-1]['content']
+        for i in range(0, len(text), 4):
+            self.write_line({'model': scenario, 'message': {'role': 'assistant', 'content': text[i:i + 4]},
+                             'done': False})
+            time.sleep(0.01)
+        self.write_line({'model': scenario, 'message': {'role': 'assistant', 'content': ''}, 'done': True})
+        self.wfile.write(b'0\r\n\r\n')
+
+    def write_line(self, data):
+        line = json.dumps(data, ensure_ascii=False).encode('utf-8') + b'\n'
+        self.wfile.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+def run_scenario(client, scenario, text='hello world'):
+    from subtitle_engine import EngineUnavailable
+
+    start = time.perf_counter()
+    try:
+        content = client.chat(scenario, [{'role': 'user', 'content': text}])
+        outcome = {'result': 'ok', 'content': content}
+    except EngineUnavailable as e:
+        outcome = {'result': 'unavailable', 'error': str(e)}
+    outcome['seconds'] = time.perf_counter() - start
+    outcome['circuit'] = client.breaker.state
+    return outcome
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output', help='把结果写入该 JSON 文件')
+    args = parser.parse_args()
+
+    from subtitle_engine import (CircuitBreaker, LLMClient, LLMEngine, TranslationEngine, models, register_engine,
+                                 translation)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f'http://127.0.0.1:{server.server_port}'
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'scenarios': {}}
+
+    def new_client(**options):
+        return LLMClient(host=host, first_token_timeout=1.0, timeout=5.0, stall_timeout=2.0, backoff=0.05,
+                         breaker=CircuitBreaker(failure_threshold=2, reset_timeout=1.0), **options)
+
+    client = new_client()
+    scenarios = report['scenarios']
+    scenarios['ok'] = run_scenario(client, 'ok')
+    scenarios['slow_first_token'] = run_scenario(client, 'slow')
+    scenarios['hang'] = run_scenario(client, 'hang')
+    # 前两次 500，第三次成功：在重试次数内恢复
+    scenarios['flaky'] = run_scenario(new_client(), 'flaky')
+    # 首次请求在首字预算快用完时才报错，重试的首字延迟 0.3 秒：重试有自己完整的首字预算，仍能成功
+    scenarios['late_error_retry'] = run_scenario(new_client(), 'late_error')
+    # 持续故障：两次失败后熔断，熔断期间立即拒绝，到期后试探请求成功则恢复
+    client = new_client()
+    scenarios['down'] = [run_scenario(client, 'down') for _ in range(3)]
+    time.sleep(1.1)
+    scenarios['recovered_after_reset'] = run_scenario(client, 'ok')
+
+    # 并发上限：4 个请求同时发往卡死的服务，最多 2 个占用连接，其余在首字预算内拿不到名额
+    client = new_client(max_concurrency=2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(run_scenario(client, 'hang'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scenarios['concurrency_limit'] = sorted(result['error'] for result in results)
+
+    # 回退：LLM 首字超出预算时由备用引擎（这里用桩代替 MarianMT）给出译文
+    class StubMT(TranslationEngine):
+        def translate_batch(self, texts, pair=None):
+            return ['MT:' + text for text in texts]
+
+    register_engine(StubMT('MT-stub'))
+    register_engine(LLMEngine('LLM-stub-server', fallback='MT-stub'))
+    translation.llm_client = new_client()
+    models.llm_model = 'slow'
+    start = time.perf_counter()
+    streamed = list(translation.translate_stream('fallback please', 'LLM-stub-server'))
+    scenarios['fallback_to_mt'] = {'outputs': streamed, 'seconds': time.perf_counter() - start}
+    server.shutdown()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# 翻译引擎基准：对比各注册引擎（fp32 PyTorch、int8 量化、CTranslate2 等）的加载耗时、
+# 不同批大小下的翻译延迟、吞吐和峰值内存，并以 chrF 衡量译文质量（相对参考译文和相对 MT 基线）
+# 用法:
+#   python benchmarks/bench_mt.py                               # 所有可用的 MT 引擎，批大小 1 和 8
+#   python benchmarks/bench_mt.py --engines MT MT-ct2 --threads 4 -o result.json
+import argparse, json, os, resource, subprocess, sys, time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from stats import percentiles
+
+DEFAULT_FIXTURE = os.path.join(ROOT, 'fixtures', 'bbc_tech.json')
+
+def char_ngrams(text, n):
+    text = ''.join(text.split())
+    return Counter(text[i:i + n] for i in range(len(text) - n + 1))
+
+def chrf(hypotheses, references, max_n=6, beta=2.0):
+    # 语料级 chrF（字符 1~6 元组，忽略空白），适合不分词的中文
+    scores = []
+    for n in range(1, max_n + 1):
+        match = hyp_total = ref_total = 0
+        for hyp, ref in zip(hypotheses, references):
+            hyp_grams, ref_grams = char_ngrams(hyp, n), char_ngrams(ref, n)
+            match += sum((hyp_grams & ref_grams).values())
+            hyp_total += sum(hyp_grams.values())
+            ref_total += sum(ref_grams.values())
+        if hyp_total and ref_total:
+            scores.append((match / hyp_total, match / ref_total))
+    if not scores:
+        return 0.0
+    precision = sum(p for p, _ in scores) / len(scores)
+    recall = sum(r for _, r in scores) / len(scores)
+    if precision + recall == 0:
+        return 0.0
+    return 100 * (1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall)
+
+def run_once(name, texts, batch_sizes, repeat, threads):
+    from subtitle_engine.engines import get_engine
+
+    engine = get_engine(name)
+    if not engine.available():
+        return {'engine': name, 'error': '依赖或模型文件缺失'}
+    if threads is not None and hasattr(engine, 'threads'):
+        engine.threads = threads
+    start = time.perf_counter()
+    engine.load()
+    load_seconds = time.perf_counter() - start
+    # 第一次推理包含惰性初始化，单独计时
+    start = time.perf_counter()
+    translations = engine.translate_batch(texts)
+    first_seconds = time.perf_counter() - start
+
+    batches = {}
+    for batch_size in batch_sizes:
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for i in range(0, len(texts), batch_size):
+                batch_start = time.perf_counter()
+                engine.translate_batch(texts[i:i + batch_size])
+                latencies.append(time.perf_counter() - batch_start)
+        elapsed = time.perf_counter() - start
+        batches[str(batch_size)] = {
+            'batch_seconds': percentiles(latencies),
+            'sentences_per_second': repeat * len(texts) / elapsed,
+        }
+    return {
+        'engine': name,
+        'model': engine.model_id(),
+        'load_seconds': load_seconds,
+        'first_translation_seconds': first_seconds,
+        'batches': batches,
+        'translations': translations,
+        # Linux 下 ru_maxrss 单位为 KB
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def run_isolated(name, args):
+    # 每个引擎在独立进程中运行，加载耗时和峰值内存互不影响
+    cmd = [sys.executable, os.path.abspath(__file__), '--single', '--engines', name, '--fixture', args.fixture,
+           '--repeat', str(args.repeat), '--batch-sizes'] + [str(size) for size in args.batch_sizes]
+    if args.threads is not None:
+        cmd += ['--threads', str(args.threads)]
+    output = subprocess.run(cmd, capture_output=True, text=True)
+    if output.returncode != 0:
+        error = output.stderr.strip().splitlines()
+        return {'engine': name, 'error': error[-1] if error else 'failed'}
+    return json.loads(output.stdout)
+
+def main():
+    from subtitle_engine.engines import engines, list_engines
+
+    mt_engines = [name for name in list_engines() if engines[name].batching]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--engines', nargs='+', default=mt_engines, choices=list_engines())
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE, help='带 reference 参考译文的夹具 (JSON)')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threads', type=int, help='覆盖引擎的推理线程数')
+    parser.add_argument('-o', '--output', help='把结果写入该 JSON 文件')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    with open(args.fixture, encoding='utf-8') as f:
+        segments = json.load(f)['segments']
+    texts = [segment['text'] for segment in segments]
+    if args.single:
+        print(json.dumps(run_once(args.engines[0], texts, args.batch_sizes, args.repeat, args.threads),
+                         ensure_ascii=False))
+        return
+
+    results = [run_isolated(name, args) for name in args.engines]
+    references = [segment.get('reference') for segment in segments]
+    baseline = next((r['translations'] for r in results if r['engine'] == 'MT' and 'translations' in r), None)
+    for result in results:
+        if 'translations' not in result:
+            continue
+        if all(references):
+            result['chrf_reference'] = chrf(result['translations'], references)
+        if baseline is not None:
+            # 与当前默认后端（fp32 束搜索）的一致程度
+            result['chrf_vs_mt'] = chrf(result['translations'], baseline)
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'sentences': len(texts),
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+if __name__ == '__main__':
+    main()
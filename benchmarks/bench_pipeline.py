@@ -0,0 +1,259 @@
+# 端到端基准：用假音频源代替 PyAudio，把录音夹具按 1 倍实时或最快速度回放进 AudioProcessor，
+# 统计实时率、部分结果上屏延迟、整句延迟、每秒翻译数和峰值内存，结果以 JSON 输出
+# 用法:
+#   python benchmarks/bench_pipeline.py                        # 默认夹具，MT 与 LLM 桩引擎，1x 与最快速度
+#   python benchmarks/bench_pipeline.py --audio talk.wav       # 使用真实录音和 Vosk 模型
+#   python benchmarks/bench_pipeline.py --engines LLM-stub --speeds max -o result.json
+import argparse, json, os, resource, subprocess, sys, threading, time, wave
+from types import SimpleNamespace
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+from stats import percentiles
+
+DEFAULT_FIXTURE = os.path.join(ROOT, 'fixtures', 'bbc_tech.json')
+CHUNK_FRAMES = 8000
+
+class ScriptedRecognizer:
+    # 按夹具中的时间轴模拟 KaldiRecognizer：随着音频时间推进，逐词给出部分结果，句末给出完整结果
+    # clock 返回当前音频时间；静音被 VAD 跳过时识别器收到的音频少于实际时长，因此不能自己累计
+    def __init__(self, fixture, clock):
+        self.segments = fixture['segments']
+        self.clock_func = clock
+        self.clock = 0.0
+        self.index = 0
+        self.result = ''
+
+    def AcceptWaveform(self, data):
+        self.clock = self.clock_func()
+        if self.index < len(self.segments) and self.clock >= self.segments[self.index]['end']:
+            self.result = self.segments[self.index]['text']
+            self.index += 1
+            return True
+        return False
+
+    def Result(self):
+        return json.dumps({'text': self.result})
+
+    def PartialResult(self):
+        if self.index >= len(self.segments):
+            return json.dumps({'partial': ''})
+        segment = self.segments[self.index]
+        words = segment['text'].split()
+        elapsed = self.clock - segment['start']
+        if elapsed <= 0:
+            return json.dumps({'partial': ''})
+        spoken = int(len(words) * elapsed / (segment['end'] - segment['start']))
+        return json.dumps({'partial': ' '.join(words[:spoken])})
+
+    def FinalResult(self):
+        # 强制结束：当前句子已经开始时给出整句，否则没有待输出的内容
+        if self.index < len(self.segments) and self.clock > self.segments[self.index]['start']:
+            self.result = self.segments[self.index]['text']
+            self.index += 1
+            return self.Result()
+        return json.dumps({'text': ''})
+
+def fixture_chunks(fixture):
+    # 句子区间内为噪声（让 VAD 判为语音），其余为静音
+    rate = fixture['sample_rate']
+    total = int(fixture['duration'] * rate)
+    speech = np.zeros(total, dtype=bool)
+    for segment in fixture['segments']:
+        speech[int(segment['start'] * rate):int(segment['end'] * rate)] = True
+    rng = np.random.default_rng(0)
+    for i in range(0, total, CHUNK_FRAMES):
+        mask = speech[i:i + CHUNK_FRAMES]
+        samples = (rng.normal(0, 3000, len(mask)) * mask).astype(np.int16)
+        yield samples.tobytes()
+
+def wav_chunks(path):
+    with wave.open(path, 'rb') as wf:
+        while True:
+            data = wf.readframes(CHUNK_FRAMES)
+            if not data:
+                break
+            yield data
+
+class StubLLMClient:
+    # 代替 ollama.Client 的桩：固定首字延迟后逐字流式返回，用于在没有 Ollama 服务时测量流水线本身的开销
+    def __init__(self, first_token_delay=0.15, token_delay=0.01):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    def chat(self, model, messages, options=None, stream=False):
+        text = '译文：' + messages[-1]['content']
+        if not stream:
+            time.sleep(self.first_token_delay + self.token_delay * len(text))
+            return SimpleNamespace(message=SimpleNamespace(content=text))
+        return self.stream(text)
+
+    def stream(self, text):
+        time.sleep(self.first_token_delay)
+        for i in range(0, len(text), 4):
+            time.sleep(self.token_delay)
+            yield SimpleNamespace(message=SimpleNamespace(content=text[i:i + 4]))
+
+def run_once(engine, speed, audio=None, fixture_path=DEFAULT_FIXTURE, drain_timeout=30.0, vad='energy',
+             first_token_delay=0.15):
+    from subtitle_engine import AudioProcessor, LLMClient, metrics, translation
+
+    if engine == 'LLM-stub':
+        translation.llm_client = LLMClient(client=StubLLMClient(first_token_delay))
+        engine_name = 'LLM'
+    else:
+        engine_name = engine
+    processor = AudioProcessor(vad=None if vad == 'none' else vad)
+    processor.set_translation_engine(engine_name)
+    if audio:
+        with wave.open(audio, 'rb') as wf:
+            sample_rate = wf.getframerate()
+            audio_seconds = wf.getnframes() / sample_rate
+        processor.sample_rate = sample_rate
+        chunks = wav_chunks(audio)
+    else:
+        with open(fixture_path, encoding='utf-8') as f:
+            fixture = json.load(f)
+        sample_rate = fixture['sample_rate']
+        audio_seconds = fixture['duration']
+        processor.recognizer = ScriptedRecognizer(fixture, lambda: processor.audio_time)
+        chunks = fixture_chunks(fixture)
+
+    text_times = {}
+    partial_latency, final_latency = [], []
+    results = {'translations': 0, 'sentences': 0}
+    lock = threading.Lock()
+
+    def on_text(text):
+        with lock:
+            text_times.setdefault(text, time.perf_counter())
+
+    # 包装翻译线程的回调，按原文找到对应的 text_ready 时间
+    worker = processor.translation_worker
+    original_result, original_progress = worker.on_result, worker.on_progress
+
+    def on_result(job, translated, skipped):
+        now = time.perf_counter()
+        with lock:
+            results['translations'] += 1
+            start = text_times.get(job.text)
+            if start is not None and job.kind == 'partial':
+                partial_latency.append(now - start)
+            elif start is not None and job.kind == 'final':
+                final_latency.append(now - start)
+                results['sentences'] += 1
+        original_result(job, translated, skipped)
+
+    def on_progress(job, translated, skipped):
+        # 流式翻译的第一段内容上屏即视为部分结果已显示
+        now = time.perf_counter()
+        with lock:
+            start = text_times.pop(job.text, None) if job.kind == 'partial' else None
+            if start is not None:
+                partial_latency.append(now - start)
+        original_progress(job, translated, skipped)
+
+    worker.on_result = on_result
+    worker.on_progress = on_progress
+    processor.text_ready.connect(on_text)
+
+    thread = threading.Thread(target=processor.process_audio, daemon=True)
+    thread.start()
+    processor.resume()
+    chunk_seconds = CHUNK_FRAMES / sample_rate
+    start = time.perf_counter()
+    for i, data in enumerate(chunks):
+        if speed != 'max':
+            # 按实时速度送入：与开始时间对齐，避免误差累积
+            delay = start + i * chunk_seconds / float(speed) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            # 最快速度：音频缓冲区容量有限，等识别线程腾出空间再写入，避免覆盖未读的音频
+            buffer = processor.audio_buffer
+            while buffer.capacity - buffer.backlog() < len(data) // buffer.frame_bytes:
+                time.sleep(0.001)
+        processor.audio_callback(data, CHUNK_FRAMES, None, None)
+    # 等待识别和翻译队列清空
+    deadline = time.perf_counter() + drain_timeout
+    while time.perf_counter() < deadline:
+        if processor.audio_buffer.backlog() == 0 and worker.get_stats()['depth'] == 0:
+            time.sleep(0.2)
+            if processor.audio_buffer.backlog() == 0 and worker.get_stats()['depth'] == 0:
+                break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    processor.stop()
+    thread.join()
+
+    stats = worker.get_stats()
+    return {
+        'engine': engine,
+        'speed': speed,
+        'first_token_delay': first_token_delay if engine == 'LLM-stub' else None,
+        'source': audio or os.path.relpath(fixture_path, os.path.dirname(ROOT)),
+        'audio_seconds': audio_seconds,
+        'wall_seconds': elapsed,
+        'real_time_factor': elapsed / audio_seconds if audio_seconds else 0.0,
+        'partial_to_display_seconds': percentiles(partial_latency),
+        'final_sentence_seconds': percentiles(final_latency),
+        'translations': results['translations'],
+        'sentences': results['sentences'],
+        'translations_per_second': results['translations'] / elapsed if elapsed else 0.0,
+        'skipped_partials': stats['skipped'],
+        'dropped_partials': stats['dropped'],
+        'cancelled_streams': stats['cancelled'],
+        'translation_errors': stats['errors'],
+        'vad_skipped_seconds': metrics.counter('vad_skipped_seconds_total').value,
+        'audio_overrun_seconds': processor.audio_buffer.overrun_frames / sample_rate,
+        'decode_calls': metrics.histogram('recognizer_decode_seconds').snapshot()['count'],
+        'cpu_seconds': time.process_time(),
+        # Linux 下 ru_maxrss 单位为 KB
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def run_isolated(engine, speed, args):
+    # 每个组合在独立进程中运行，峰值内存互不影响
+    cmd = [sys.executable, os.path.abspath(__file__), '--single', '--engines', engine, '--speeds', speed,
+           '--fixture', args.fixture, '--vad', args.vad, '--first-token-delay', str(args.first_token_delay)]
+    if args.audio:
+        cmd += ['--audio', args.audio]
+    output = subprocess.run(cmd, capture_output=True, text=True)
+    if output.returncode != 0:
+        error = output.stderr.strip().splitlines()
+        return {'engine': engine, 'speed': speed, 'error': error[-1] if error else 'failed'}
+    return json.loads(output.stdout)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--engines', nargs='+', default=['MT', 'LLM-stub'], choices=['MT', 'LLM', 'LLM-stub'])
+    parser.add_argument('--speeds', nargs='+', default=['1', 'max'], help='回放倍速，或 max 表示不等待')
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE, help='脚本化语音夹具 (JSON)')
+    parser.add_argument('--audio', help='16 位 PCM WAV，指定后使用真实 Vosk 识别')
+    parser.add_argument('--vad', default='energy', choices=['energy', 'webrtc', 'auto', 'none'],
+                        help='识别前的语音活动检测，none 表示每块音频都送入识别器')
+    parser.add_argument('--first-token-delay', type=float, default=0.15,
+                        help='LLM 桩的首字延迟（秒）；大于部分结果间隔时检查流式部分译文仍能上屏')
+    parser.add_argument('-o', '--output', help='把结果写入该 JSON 文件')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_once(args.engines[0], args.speeds[0], args.audio, args.fixture, vad=args.vad,
+                                  first_token_delay=args.first_token_delay)))
+        return
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'results': [run_isolated(engine, speed, args) for engine in args.engines for speed in args.speeds],
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+if __name__ == '__main__':
+    main()
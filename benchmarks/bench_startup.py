@@ -0,0 +1,97 @@
+# 启动耗时基准：导入耗时（各自在新进程中测量）、模型加载耗时，以及从开始送入音频
+# 到第一条字幕 / 第一条译文的延迟。界面代码在 app.py 中（main.py 只是启动入口），因此测量导入 app 的耗时
+# 用法: python benchmarks/bench_startup.py [--audio sample.wav] [--engine MT]
+import argparse, json, os, subprocess, sys, threading, time, wave
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def import_time(module, repeat):
+    # 在新的解释器中导入，避免受当前进程已导入模块的影响
+    code = f'import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)'
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    samples = []
+    for _ in range(repeat):
+        try:
+            output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            return {'error': e.stderr.strip().splitlines()[-1] if e.stderr.strip() else str(e)}
+        samples.append(float(output.strip().splitlines()[-1]))
+    return {'min': min(samples), 'mean': sum(samples) / len(samples)}
+
+def timed(func, *args):
+    start = time.perf_counter()
+    try:
+        func(*args)
+    except Exception as e:
+        return {'error': str(e)}
+    return {'seconds': time.perf_counter() - start}
+
+def first_subtitle_latency(audio_path, engine, timeout):
+    # 冷启动：创建处理器后按实时速度送入音频，模型在首次使用时加载
+    from subtitle_engine import AudioProcessor
+    start = time.perf_counter()
+    marks = {}
+    done = threading.Event()
+
+    def mark(name):
+        def slot(*args):
+            if name not in marks:
+                marks[name] = time.perf_counter() - start
+            if 'first_text' in marks and 'first_translation' in marks:
+                done.set()
+        return slot
+
+    processor = AudioProcessor()
+    processor.set_translation_engine(engine)
+    processor.text_ready.connect(mark('first_text'))
+    processor.translation_ready.connect(mark('first_translation'))
+    thread = threading.Thread(target=processor.process_audio, daemon=True)
+    thread.start()
+    processor.resume()
+    with wave.open(audio_path, 'rb') as wf:
+        chunk_seconds = 8000 / wf.getframerate()
+        while not done.is_set():
+            data = wf.readframes(8000)
+            if not data:
+                break
+            processor.audio_callback(data, 8000, None, None)
+            time.sleep(chunk_seconds)
+    done.wait(timeout)
+    processor.stop()
+    thread.join()
+    return marks
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--audio', help='16 kHz 单声道 16 位 WAV，用于测量首条字幕延迟')
+    parser.add_argument('--engine', choices=['MT', 'LLM'], default='MT')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    results = {
+        'import': {
+            'subtitle_engine': import_time('subtitle_engine', args.repeat),
+            'app': import_time('app', args.repeat),
+        },
+    }
+    from subtitle_engine import models
+    results['model_load'] = {
+        'vosk': timed(models.get_vosk_model, 'english'),
+        'marian': timed(models.get_translator),
+    }
+    if args.audio:
+        # 模型已在上面加载过，这里改为在新进程中测量真正的冷启动
+        code = ('import json, sys; sys.path.insert(0, "benchmarks"); import bench_startup; '
+                f'print(json.dumps(bench_startup.first_subtitle_latency({args.audio!r}, {args.engine!r}, {args.timeout})))')
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+        if output.returncode == 0:
+            results['first_subtitle'] = json.loads(output.stdout.strip().splitlines()[-1])
+        else:
+            results['first_subtitle'] = {'error': output.stderr.strip().splitlines()[-1]}
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
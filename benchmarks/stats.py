@@ -0,0 +1,9 @@
+# 基准脚本共用的统计函数
+def percentiles(values, scale=1, suffix=''):
+    # 最近秩法取 p50 / p95 / p99 与最大值；scale 与 suffix 用于换算单位，如 scale=1000, suffix='_ms'
+    if not values:
+        return {'count': 0}
+    values = sorted(value * scale for value in values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {'count': len(values), 'p50' + suffix: pick(0.5), 'p95' + suffix: pick(0.95),
+            'p99' + suffix: pick(0.99), 'max' + suffix: values[-1]}
@@ -0,0 +1,17 @@
+# 实时字幕识别与翻译引擎，不依赖界面库，模型在首次使用时加载
+from .models import (vosk_model_paths, translator_configs, ModelRegistry, registry, get_vosk_model,
+                     create_recognizer, get_translator, list_source_languages, warm_up)
+from .signals import Signal
+from .engines import (TranslationEngine, MarianEngine, CTranslate2Engine, LLMEngine, EngineUnavailable,
+                      register_engine, get_engine, list_engines)
+from .llm import LLMClient, CircuitBreaker
+from .metrics import metrics, MetricsRegistry, PrometheusExporter, JsonlExporter
+from .translation import (TranslationCache, TranslationPool, TranslationWorker, translation_cache, llm_translate,
+                          llm_translate_stream, translate_batch, translate_text, translate_stream)
+from .history import History
+from .ringbuffer import AudioRingBuffer
+from .processor import AudioProcessor
+from .transcript import TranscriptWriter
+from .store import TranscriptStore
+from .server import SubtitleServer
+from .workers import RecognizerProcess, ProcessEngine, isolate_engines, stop_workers
@@ -0,0 +1,180 @@
+# 可插拔的翻译引擎：每个引擎提供批量翻译，可选流式翻译，按名称注册后由 set_translation_engine 选择
+# 各方法的 pair 为语言对（如 'en-zh'），None 表示引擎的默认语言对，切换目标语言时无需重新注册引擎
+# 注册新引擎: register_engine(MarianEngine('MT-beam4', num_beams=4))
+import importlib.util, os
+from . import models
+
+class EngineUnavailable(RuntimeError):
+    # 引擎暂时无法给出结果（超时、熔断、服务不可用），翻译层会改用该引擎的 fallback 引擎
+    pass
+
+class TranslationEngine:
+    # batching: 适合把多条请求合并成一批推理；streaming: 支持流式输出（被新请求取代时可中止）
+    # incremental: 部分结果可以拆成已稳定的前缀和剩余部分分别翻译再拼接
+    # fallback: 抛出 EngineUnavailable 时改用的引擎名
+    batching = False
+    streaming = False
+    incremental = False
+
+    def __init__(self, name, fallback=None):
+        self.name = name
+        self.fallback = fallback
+
+    def model_id(self, pair=None):
+        # 用作翻译缓存的键，同一模型在不同量化或解码设置、不同语言对下的结果不共用缓存
+        return self.name if pair is None else f'{self.name}|{pair}'
+
+    def available(self, pair=None):
+        # 依赖或模型文件是否齐全，界面只列出可用的引擎
+        return True
+
+    def load(self, pair=None):
+        # 预加载模型，供 warm_up 在后台调用
+        pass
+
+    def translate_batch(self, texts, pair=None):
+        raise NotImplementedError
+
+    def translate_stream(self, text, should_cancel=None, context=None, pair=None):
+        # 不支持流式输出的引擎一次给出完整译文，忽略前文
+        yield self.translate_batch([text], pair)[0]
+
+class MarianEngine(TranslationEngine):
+    # PyTorch MarianMT。num_beams 为 None 时沿用模型自带的解码设置（束搜索），1 为贪心解码；
+    # quantize=True 使用动态 int8 量化的模型；threads 设置 PyTorch 推理线程数（对整个进程生效）
+    batching = True
+    incremental = True
+
+    def __init__(self, name, pair=models.default_language_pair, num_beams=None, max_new_tokens=None,
+                 quantize=False, threads=None):
+        super().__init__(name)
+        self.pair = pair
+        self.num_beams = num_beams
+        self.max_new_tokens = max_new_tokens
+        self.quantize = quantize
+        self.threads = threads
+        self.threads_applied = False
+
+    def model_id(self, pair=None):
+        # 模型名本身区分了语言对
+        model = models.translator_configs[pair or self.pair]
+        if not self.quantize and self.num_beams is None:
+            # 与默认设置的缓存键保持一致，已有的持久化缓存仍然有效
+            return model
+        return f"{model}|{'int8' if self.quantize else 'fp32'}|beams={self.num_beams or 'default'}"
+
+    def available(self, pair=None):
+        return ((pair or self.pair) in models.translator_configs
+                and all(importlib.util.find_spec(name) is not None for name in ('torch', 'transformers')))
+
+    def load(self, pair=None):
+        # 线程数是进程级设置，只在首次加载时设置一次，之后每次翻译不再重复覆盖
+        if self.threads and not self.threads_applied:
+            import torch
+            torch.set_num_threads(self.threads)
+            self.threads_applied = True
+        if self.quantize:
+            return models.get_quantized_translator(pair or self.pair)
+        return models.get_translator(pair or self.pair)
+
+    def translate_batch(self, texts, pair=None):
+        # 一次性翻译整批文本（自动补齐）
+        tokenizer, translator = self.load(pair)
+        inputs = tokenizer(texts, return_tensors="pt", padding=True)
+        options = {}
+        if self.num_beams is not None:
+            options['num_beams'] = self.num_beams
+        if self.max_new_tokens is not None:
+            options['max_new_tokens'] = self.max_new_tokens
+        translated = translator.generate(**inputs, **options)
+        return tokenizer.batch_decode(translated, skip_special_tokens=True)
+
+class CTranslate2Engine(TranslationEngine):
+    # 用 CTranslate2 转换后的 MarianMT 推理（默认 int8），CPU 上明显快于 PyTorch；beam_size=1 为贪心解码
+    # threads 为每次翻译使用的线程数，0 表示由 CTranslate2 决定
+    batching = True
+    incremental = True
+
+    def __init__(self, name, pair=models.default_language_pair, beam_size=1, compute_type='int8', threads=0,
+                 max_decoding_length=256):
+        super().__init__(name)
+        self.pair = pair
+        self.beam_size = beam_size
+        self.compute_type = compute_type
+        self.threads = threads
+        self.max_decoding_length = max_decoding_length
+
+    def model_id(self, pair=None):
+        return f'{models.ct2_model_paths[pair or self.pair]}|{self.compute_type}|beams={self.beam_size}'
+
+    def available(self, pair=None):
+        # 需要先转换对应语言对的模型
+        path = models.ct2_model_paths.get(pair or self.pair)
+        return importlib.util.find_spec('ctranslate2') is not None and path is not None and os.path.isdir(path)
+
+    def load(self, pair=None):
+        return models.get_ct2_translator(pair or self.pair, self.compute_type, self.threads)
+
+    def translate_batch(self, texts, pair=None):
+        tokenizer, translator = self.load(pair)
+        sources = [tokenizer.convert_ids_to_tokens(tokenizer.encode(text)) for text in texts]
+        results = translator.translate_batch(sources, beam_size=self.beam_size,
+                                             max_decoding_length=self.max_decoding_length)
+        return [tokenizer.decode(tokenizer.convert_tokens_to_ids(result.hypotheses[0]), skip_special_tokens=True)
+                for result in results]
+
+class LLMEngine(TranslationEngine):
+    # 通过 Ollama 调用 LLM，逐条翻译，支持流式输出；超时或服务不可用时由 fallback 引擎（默认 MT）翻译
+    streaming = True
+
+    def __init__(self, name, fallback='MT'):
+        super().__init__(name, fallback)
+
+    def model_id(self, pair=None):
+        # 默认语言对沿用原来的缓存键
+        if pair is None or pair == models.default_language_pair:
+            return models.llm_model
+        return f'{models.llm_model}|{pair}'
+
+    def available(self, pair=None):
+        return importlib.util.find_spec('ollama') is not None
+
+    def translate_batch(self, texts, pair=None):
+        from .translation import llm_translate
+        return [llm_translate(text, target=target_language(pair)) for text in texts]
+
+    def translate_stream(self, text, should_cancel=None, context=None, pair=None):
+        from .translation import llm_translate_stream
+        return llm_translate_stream(text, should_cancel, context, target=target_language(pair))
+
+def target_language(pair=None):
+    # 语言对中目标语言的名称，用于 LLM 提示词
+    code = (pair or models.default_language_pair).split('-')[-1]
+    return models.language_names.get(code, code)
+
+engines = {}
+
+def register_engine(engine):
+    engines[engine.name] = engine
+    return engine
+
+def get_engine(name):
+    engine = engines.get(name)
+    if engine is None:
+        raise ValueError(f'未注册的翻译引擎: {name}')
+    return engine
+
+def list_engines(available_only=False, pair=None):
+    return [name for name, engine in engines.items() if not available_only or engine.available(pair)]
+
+def engine_flag(name, flag):
+    # 查询引擎的 batching / streaming / incremental 属性，未注册的引擎视为都不支持
+    engine = engines.get(name)
+    return engine is not None and getattr(engine, flag)
+
+# MT: 原有的 fp32 PyTorch 模型和默认解码设置；MT-int8: 动态量化加贪心解码；
+# MT-ct2: CTranslate2 int8 加贪心解码，需要先转换模型
+register_engine(MarianEngine('MT'))
+register_engine(MarianEngine('MT-int8', num_beams=1, quantize=True))
+register_engine(CTranslate2Engine('MT-ct2'))
+register_engine(LLMEngine('LLM'))
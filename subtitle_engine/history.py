@@ -0,0 +1,122 @@
+# 有上限的历史记录：内存中只保留最近 limit 句，用哈希索引做 O(1) 去重；
+# 被淘汰的句子写入记录库或溢出文件，并记入固定大小的布隆过滤器，保证整个会话内都能去重且内存不随时长增长
+import hashlib, json, os, threading
+from collections import deque
+
+def text_digest(text):
+    # 64 位有符号摘要，可直接存入 SQLite 的 INTEGER 列
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+class BloomFilter:
+    def __init__(self, bits=1 << 20, hashes=4):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray(bits // 8)
+
+    def positions(self, digest):
+        # 由一个 64 位摘要派生出多个位置（双重哈希）
+        h1 = digest & 0xFFFFFFFF
+        h2 = (digest >> 32) & 0xFFFFFFFF | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, digest):
+        for pos in self.positions(digest):
+            self.array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest):
+        return all(self.array[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(digest))
+
+    def clear(self):
+        self.array = bytearray(self.bits // 8)
+
+class History:
+    def __init__(self, limit=500, spill_path=None, bloom_bits=1 << 20):
+        self.limit = limit
+        self.spill_path = spill_path
+        self.entries = deque()      # (摘要, 原文, 译文)
+        self.index = {}             # 摘要 -> 窗口内出现次数
+        self.evicted = BloomFilter(bloom_bits)
+        self.evicted_count = 0
+        self.spill_offset = 0       # 清空后只在此偏移之后的溢出内容中查找
+        self.store = None
+        self.session_id = None
+        self.lock = threading.Lock()
+
+    def attach_store(self, store, session_id):
+        # 已写入记录库的句子被淘汰后不再单独溢出，去重时直接查库
+        self.store = store
+        self.session_id = session_id
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        with self.lock:
+            entries = list(self.entries)
+        return iter([(text, translation) for _, text, translation in entries])
+
+    def __contains__(self, text):
+        digest = text_digest(text)
+        with self.lock:
+            return self.contains_digest(digest, text)
+
+    def contains_digest(self, digest, text):
+        # 需持有 self.lock
+        if digest in self.index:
+            return True
+        if digest not in self.evicted:
+            return False
+        # 布隆过滤器可能误报，命中时到库或溢出文件中确认
+        if self.store is not None:
+            return self.store.has_source(self.session_id, text)
+        return self.spilled_contains(text)
+
+    def add(self, text, translation):
+        # 新句子返回 True，重复的句子返回 False
+        digest = text_digest(text)
+        with self.lock:
+            if self.contains_digest(digest, text):
+                return False
+            self.entries.append((digest, text, translation))
+            self.index[digest] = self.index.get(digest, 0) + 1
+            while len(self.entries) > self.limit:
+                self.evict()
+        return True
+
+    def evict(self):
+        digest, text, translation = self.entries.popleft()
+        count = self.index[digest] - 1
+        if count:
+            self.index[digest] = count
+        else:
+            del self.index[digest]
+        self.evicted.add(digest)
+        self.evicted_count += 1
+        if self.store is None and self.spill_path:
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'text': text, 'translation': translation}, ensure_ascii=False) + '\n')
+
+    def spilled_contains(self, text):
+        if not self.spill_path:
+            # 没有保存被淘汰的内容时只能相信布隆过滤器
+            return True
+        try:
+            with open(self.spill_path, encoding='utf-8') as f:
+                f.seek(self.spill_offset)
+                return any(json.loads(line)['text'] == text for line in f)
+        except FileNotFoundError:
+            return False
+
+    def recent(self, n):
+        with self.lock:
+            entries = list(self.entries)[-n:] if n > 0 else []
+        return [(text, translation) for _, text, translation in entries]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.index.clear()
+            self.evicted.clear()
+            self.evicted_count = 0
+            if self.spill_path and os.path.exists(self.spill_path):
+                self.spill_offset = os.path.getsize(self.spill_path)
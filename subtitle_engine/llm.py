@@ -0,0 +1,185 @@
+# 受管理的 LLM 客户端：复用 HTTP 长连接、限制并发、每个请求有截止时间，失败时退避重试，
+# 连续失败后熔断一段时间；超时、熔断等错误抛出 EngineUnavailable，由翻译层切换到备用引擎
+import logging, queue, random, threading, time
+from .engines import EngineUnavailable
+from .metrics import metrics as default_metrics
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    # 连续失败 failure_threshold 次后熔断 reset_timeout 秒，期间直接拒绝请求；
+    # 到期后只放行一个试探请求，成功则恢复，失败则重新熔断；name 只用于日志
+    def __init__(self, failure_threshold=3, reset_timeout=30.0, name='LLM'):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = 'half-open'
+            if self.state == 'half-open':
+                if self.probing:
+                    return False
+                self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.state == 'half-open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning('%s 连续失败 %d 次，熔断 %.0f 秒', self.name, self.failures,
+                                   self.reset_timeout)
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        # 请求被调用方取消，既不算成功也不算失败
+        with self.lock:
+            self.probing = False
+
+    @property
+    def is_open(self):
+        return self.state == 'open'
+
+class LLMClient:
+    # timeout: 单个请求从发出到生成结束的截止时间；first_token_timeout: 每次尝试首个 token 的延迟预算，
+    # 超出即放弃（交给备用引擎）；stall_timeout: HTTP 读超时，服务端卡住时后台线程最多等待这么久
+    # max_concurrency: 同时进行的请求数上限；retries / backoff: 尚未收到任何输出时的重试次数与退避基数
+    # client: 可以传入已有的（或测试用的）Ollama 客户端，需提供 chat(model, messages, options, stream)
+    def __init__(self, host=None, timeout=30.0, first_token_timeout=5.0, stall_timeout=10.0,
+                 max_concurrency=2, max_connections=4, retries=2, backoff=0.25, max_backoff=2.0,
+                 breaker=None, client=None, metrics=None):
+        self.host = host
+        self.timeout = timeout
+        self.first_token_timeout = first_token_timeout
+        self.stall_timeout = stall_timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.client = client
+        self.client_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.metrics = metrics or default_metrics
+        self.metrics.gauge('llm_circuit_open', func=lambda: int(self.breaker.is_open))
+
+    def get_client(self):
+        # 整个进程共用一个 httpx 连接池，保持长连接
+        with self.client_lock:
+            if self.client is None:
+                import httpx, ollama
+                self.client = ollama.Client(
+                    host=self.host,
+                    timeout=httpx.Timeout(self.stall_timeout, connect=min(self.stall_timeout, 3.0)),
+                    limits=httpx.Limits(max_connections=self.max_connections,
+                                        max_keepalive_connections=self.max_connections))
+            return self.client
+
+    def chat(self, model, messages, options=None):
+        # 非流式调用，返回完整内容
+        return ''.join(self.chat_stream(model, messages, options))
+
+    def chat_stream(self, model, messages, options=None, should_cancel=None):
+        # 产出生成的内容片段；should_cancel() 返回 True 时停止（不抛出异常）
+        # 请求在后台线程中进行，这里只按截止时间等待，服务端卡住也不会阻塞调用方
+        start = time.monotonic()
+        deadline = start + self.timeout
+        attempt = 0
+        if not self.breaker.allow():
+            self.metrics.inc('llm_requests_total', {'result': 'rejected'})
+            raise EngineUnavailable('LLM 服务熔断中')
+        settled = False  # 是否已经向熔断器报告了成功或失败
+        try:
+            while True:
+                # 每次尝试（包括重试）各自有完整的首字延迟预算，但都不超过总截止时间
+                first_deadline = min(deadline, time.monotonic() + self.first_token_timeout)
+                if not self.slots.acquire(timeout=max(0.0, first_deadline - time.monotonic())):
+                    self.metrics.inc('llm_requests_total', {'result': 'busy'})
+                    raise EngineUnavailable('LLM 并发请求已满')
+                chunks = queue.Queue()
+                cancelled = threading.Event()
+                threading.Thread(target=self.pump, args=(model, messages, options, chunks, cancelled),
+                                 name='llm-request', daemon=True).start()
+                received = False
+                try:
+                    while True:
+                        if should_cancel is not None and should_cancel():
+                            self.metrics.inc('llm_requests_total', {'result': 'cancelled'})
+                            return
+                        limit = deadline if received else first_deadline
+                        remaining = limit - time.monotonic()
+                        if remaining <= 0:
+                            settled = True
+                            self.breaker.record_failure()
+                            self.metrics.inc('llm_requests_total', {'result': 'timeout'})
+                            raise EngineUnavailable('LLM 请求超时' if received else 'LLM 首个 token 超出延迟预算')
+                        try:
+                            kind, value = chunks.get(timeout=min(remaining, 0.05))
+                        except queue.Empty:
+                            continue
+                        if kind == 'chunk':
+                            if not received:
+                                received = True
+                                self.metrics.observe('llm_first_token_seconds', time.monotonic() - start)
+                            yield value
+                        elif kind == 'done':
+                            settled = True
+                            self.breaker.record_success()
+                            self.metrics.inc('llm_requests_total', {'result': 'ok'})
+                            return
+                        else:
+                            break
+                finally:
+                    # 调用方放弃或出错时通知后台线程尽快退出
+                    cancelled.set()
+                # 请求出错：尚未输出任何内容时在截止时间内退避重试，重试不计入熔断
+                self.metrics.inc('llm_requests_total', {'result': 'error'})
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                if received or attempt >= self.retries or time.monotonic() + delay >= deadline:
+                    settled = True
+                    self.breaker.record_failure()
+                    raise EngineUnavailable(f'LLM 请求失败: {value}') from value
+                logger.warning('LLM 请求失败，%.2f 秒后重试: %s', delay, value)
+                self.metrics.inc('llm_retries_total')
+                attempt += 1
+                time.sleep(delay)
+        finally:
+            if not settled:
+                # 被取消或并发已满，既不算成功也不算失败
+                self.breaker.release()
+
+    def pump(self, model, messages, options, chunks, cancelled):
+        # 在后台线程中读取流式响应，调用方放弃后在下一个片段到达（或读超时）时退出
+        try:
+            stream = self.get_client().chat(model=model, messages=messages, options=options, stream=True)
+            try:
+                for chunk in stream:
+                    if cancelled.is_set():
+                        return
+                    chunks.put(('chunk', chunk.message.content or ''))
+            finally:
+                close = getattr(stream, 'close', None)
+                if close is not None:
+                    close()
+            chunks.put(('done', None))
+        except Exception as e:
+            chunks.put(('error', e))
+        finally:
+            self.slots.release()
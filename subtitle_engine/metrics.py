@@ -0,0 +1,213 @@
+# 延迟与队列指标：各处理阶段的耗时直方图（p50/p95/p99）、队列深度、错误计数，
+# 可通过 Prometheus 文本接口或 JSONL 日志导出
+import json, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+class Histogram:
+    # 保留最近 window 个样本计算分位数，同时累计总数与总和
+    def __init__(self, window=2048):
+        self.samples = [0.0] * window
+        self.window = window
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.samples[self.count % self.window] = value
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self.lock:
+            recent = sorted(self.samples[:min(self.count, self.window)])
+            count, total = self.count, self.sum
+        result = {'count': count, 'sum': total}
+        for q in QUANTILES:
+            result[f'p{int(q * 100)}'] = recent[min(len(recent) - 1, int(q * len(recent)))] if recent else 0.0
+        return result
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+class Gauge:
+    # 可以直接 set，也可以传入函数在导出时取值（例如队列长度）
+    def __init__(self, func=None):
+        self.func = func
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        if self.func is not None:
+            try:
+                return self.func()
+            except Exception:
+                return 0
+        return self.value
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def get(self, kind, name, labels, factory):
+        key = (name, tuple(sorted((labels or {}).items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(key)
+                if metric is None:
+                    metric = self.metrics[key] = (kind, factory())
+        return metric[1]
+
+    def histogram(self, name, labels=None):
+        return self.get('summary', name, labels, Histogram)
+
+    def counter(self, name, labels=None):
+        return self.get('counter', name, labels, Counter)
+
+    def gauge(self, name, labels=None, func=None):
+        gauge = self.get('gauge', name, labels, Gauge)
+        if func is not None:
+            gauge.func = func
+        return gauge
+
+    def observe(self, name, value, labels=None):
+        self.histogram(name, labels).observe(value)
+
+    def timer(self, name, labels=None):
+        return Timer(self.histogram(name, labels))
+
+    def inc(self, name, labels=None, amount=1):
+        self.counter(name, labels).inc(amount)
+
+    def snapshot(self):
+        with self.lock:
+            items = list(self.metrics.items())
+        result = []
+        for (name, labels), (kind, metric) in sorted(items):
+            result.append({'name': name, 'type': kind, 'labels': dict(labels), 'value': metric.snapshot()})
+        return result
+
+    def to_prometheus(self):
+        lines = []
+        typed = set()
+        for entry in self.snapshot():
+            name, kind = entry['name'], entry['type']
+            if name not in typed:
+                lines.append(f'# TYPE {name} {kind}')
+                typed.add(name)
+            labels = entry['labels']
+            if kind == 'summary':
+                value = entry['value']
+                for q in QUANTILES:
+                    lines.append(f"{name}{format_labels(labels, quantile=q)} {value[f'p{int(q * 100)}']}")
+                lines.append(f"{name}_sum{format_labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{format_labels(labels)} {value['count']}")
+            else:
+                lines.append(f"{name}{format_labels(labels)} {entry['value']}")
+        return '\n'.join(lines) + '\n'
+
+class Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+def escape_label_value(value):
+    # 文本格式要求标签值中的反斜杠、双引号和换行转义
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels, **extra):
+    items = dict(labels, **extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{escape_label_value(v)}"' for k, v in sorted(items.items())) + '}'
+
+# 默认的全局指标注册表，处理器、翻译线程和界面都记录到这里
+metrics = MetricsRegistry()
+
+class PrometheusExporter:
+    # 在 http://host:port/metrics 提供 Prometheus 文本格式的指标
+    def __init__(self, registry=metrics, host='127.0.0.1', port=9464):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry_ref.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class JsonlExporter:
+    # 每隔 interval 秒向 path 追加一行 JSON 快照
+    def __init__(self, path, registry=metrics, interval=10.0):
+        self.path = path
+        self.registry = registry
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='metrics-jsonl', daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self):
+        line = json.dumps({'time': time.time(), 'metrics': self.registry.snapshot()}, ensure_ascii=False)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.write()
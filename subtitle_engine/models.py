@@ -0,0 +1,253 @@
+# 模型管理：Vosk 语音识别模型与 MarianMT 翻译模型均在首次使用时加载，已加载的模型由 registry 按 LRU
+# 管理并受内存预算限制；也可以调用 warm_up 在后台线程中提前加载，避免阻塞界面启动或切换语言时卡顿
+import logging, os, threading, time
+from collections import OrderedDict
+from .metrics import metrics
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model')
+
+# 语音识别模型路径，模型目录存在时该语言才可用（模型下载见 README）
+vosk_model_paths = {
+    'english': os.path.join(MODEL_DIR, 'english'),
+    'chinese': os.path.join(MODEL_DIR, 'chinese'),
+    'japanese': os.path.join(MODEL_DIR, 'japanese'),
+    'german': os.path.join(MODEL_DIR, 'german'),
+    'french': os.path.join(MODEL_DIR, 'french'),
+    'spanish': os.path.join(MODEL_DIR, 'spanish'),
+}
+
+# 识别语言对应的语言代码，用于选择翻译语言对
+language_codes = {'english': 'en', 'chinese': 'zh', 'japanese': 'ja', 'german': 'de', 'french': 'fr',
+                  'spanish': 'es'}
+
+# 语言代码在 LLM 提示词中的名称
+language_names = {'en': 'English', 'zh': 'Chinese', 'ja': 'Japanese', 'de': 'German', 'fr': 'French',
+                  'es': 'Spanish'}
+
+# 语言在界面和记录文件中显示的名称
+language_display_names = {'english': '英文', 'chinese': '中文', 'japanese': '日文', 'german': '德文',
+                          'french': '法文', 'spanish': '西班牙文'}
+
+# 翻译模型配置（语言对 -> MarianMT 模型），首次使用时从 Hugging Face 下载
+translator_configs = {
+    'en-zh': 'Helsinki-NLP/opus-mt-en-zh',
+    'zh-en': 'Helsinki-NLP/opus-mt-zh-en',
+    'ja-en': 'Helsinki-NLP/opus-mt-ja-en',
+    'en-ja': 'Helsinki-NLP/opus-mt-en-jap',
+    'en-de': 'Helsinki-NLP/opus-mt-en-de',
+    'de-en': 'Helsinki-NLP/opus-mt-de-en',
+    'en-fr': 'Helsinki-NLP/opus-mt-en-fr',
+    'fr-en': 'Helsinki-NLP/opus-mt-fr-en',
+    'en-es': 'Helsinki-NLP/opus-mt-en-es',
+    'es-en': 'Helsinki-NLP/opus-mt-es-en',
+}
+
+# CTranslate2 格式的翻译模型目录（可选，转换方法见 README）
+ct2_model_paths = {
+    'en-zh': os.path.join(MODEL_DIR, 'opus-mt-en-zh-ct2')
+}
+
+# 默认翻译语言对
+default_language_pair = 'en-zh'
+
+# LLM翻译使用的模型
+llm_model = 'qwen2.5:7b'
+
+# LLM 翻译时附带的前文：最多多少句，以及这些句子最多占用多少 token
+llm_context_sentences = 8
+llm_context_tokens = 512
+
+# 已加载模型占用内存的上限（MB），超出时淘汰最久未使用的模型，可用环境变量 MODEL_MEMORY_BUDGET_MB 调整
+model_memory_budget_mb = float(os.environ.get('MODEL_MEMORY_BUDGET_MB', 3072))
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    # 已加载模型的 LRU：按键（如 ('vosk', 'english')）缓存，估算的内存总量超过 memory_budget 字节时
+    # 淘汰最久未使用的模型，最近加载的一个总是保留。被淘汰的模型若仍被识别器或引擎引用，
+    # 要等它们换用新模型后才真正释放。同一模型只加载一次，不同模型可以在不同线程中同时加载
+    def __init__(self, memory_budget=None):
+        self.memory_budget = memory_budget
+        self.entries = OrderedDict()  # 键 -> (模型, 估算字节数)
+        self.loading = {}             # 键 -> 该模型的加载锁
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0, 'load_seconds': 0.0}
+
+    def get(self, key, loader, size_func=None):
+        # 返回已加载的模型，未加载时调用 loader() 加载；size_func(model) 估算其内存占用
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry[0]
+            key_lock = self.loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    return entry[0]
+            start = time.perf_counter()
+            try:
+                model = loader()
+                size = size_func(model) if size_func is not None else 0
+            except BaseException:
+                with self.lock:
+                    self.loading.pop(key, None)
+                raise
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                # 先放入 entries 再移除加载锁，之后到达的调用方总能看到其中之一，不会重复加载
+                self.entries[key] = (model, size)
+                self.loading.pop(key, None)
+                self.stats['loads'] += 1
+                self.stats['load_seconds'] += elapsed
+                self.evict()
+            logger.info('已加载模型 %s（约 %.0f MB，%.1f 秒）', key, size / 2 ** 20, elapsed)
+            return model
+
+    def evict(self):
+        # 需持有 self.lock
+        while self.memory_budget and len(self.entries) > 1 and self.total_bytes() > self.memory_budget:
+            key, (_, size) = self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+            logger.info('模型内存超出预算，卸载 %s（约 %.0f MB）', key, size / 2 ** 20)
+
+    def total_bytes(self):
+        return sum(size for _, size in self.entries.values())
+
+    def is_loaded(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['loaded'] = [key for key in self.entries]
+            stats['bytes'] = self.total_bytes()
+        stats['budget'] = self.memory_budget
+        return stats
+
+registry = ModelRegistry(int(model_memory_budget_mb * 2 ** 20))
+metrics.gauge('model_memory_bytes', func=lambda: registry.get_stats()['bytes'])
+
+def dir_size(path):
+    # 模型目录的大小，作为 Vosk / CTranslate2 模型内存占用的估计
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def tensor_bytes(value):
+    # 动态量化层的权重以 (量化权重, 偏置) 元组的形式出现在 state_dict 中
+    if isinstance(value, (tuple, list)):
+        return sum(tensor_bytes(item) for item in value)
+    if hasattr(value, 'element_size'):
+        return value.numel() * value.element_size()
+    return 0
+
+def module_size(loaded):
+    # loaded 为 (tokenizer, PyTorch 模型)
+    return sum(tensor_bytes(value) for value in loaded[1].state_dict().values())
+
+def vosk_model_available(lang):
+    return lang in vosk_model_paths and os.path.isdir(vosk_model_paths[lang])
+
+def list_source_languages(available_only=False):
+    return [lang for lang in vosk_model_paths if not available_only or vosk_model_available(lang)]
+
+def pairs_for(lang):
+    # 以该识别语言为源语言的翻译语言对
+    code = language_codes.get(lang)
+    return [pair for pair in translator_configs if pair.split('-')[0] == code]
+
+def pair_languages(pair=default_language_pair):
+    # 语言对的 (源语言, 目标语言)，使用与 vosk_model_paths 相同的名称（如 'english'）
+    names = {code: lang for lang, code in language_codes.items()}
+    return tuple(names.get(code, code) for code in pair.split('-'))
+
+def pair_labels(pair=default_language_pair):
+    # 语言对的 (原文标题, 译文标题)，用于历史记录、记录文件和导出
+    return tuple(language_display_names.get(name, name) for name in pair_languages(pair))
+
+def pair_for(lang, current=default_language_pair):
+    # 切换识别语言后使用的语言对：尽量保持原来的目标语言，源语言相同时不变
+    pairs = pairs_for(lang)
+    if not pairs or current in pairs:
+        return current
+    target = current.split('-')[-1]
+    return next((pair for pair in pairs if pair.split('-')[-1] == target), pairs[0])
+
+def get_vosk_model(lang):
+    def load():
+        from vosk import Model
+        return Model(vosk_model_paths[lang])
+    return registry.get(('vosk', lang), load, lambda model: dir_size(vosk_model_paths[lang]))
+
+def vosk_model_loaded(lang):
+    return registry.is_loaded(('vosk', lang))
+
+def create_recognizer(lang, sample_rate=16000):
+    from vosk import KaldiRecognizer
+    return KaldiRecognizer(get_vosk_model(lang), sample_rate)
+
+def get_translator(pair=default_language_pair):
+    # 返回 (tokenizer, translator)
+    def load():
+        from transformers import MarianMTModel, MarianTokenizer
+        tokenizer = MarianTokenizer.from_pretrained(translator_configs[pair])
+        translator = MarianMTModel.from_pretrained(translator_configs[pair])
+        return tokenizer, translator
+    return registry.get(('marian', pair), load, module_size)
+
+def get_quantized_translator(pair=default_language_pair):
+    # 对 MarianMT 的 Linear 层做动态 int8 量化，返回 (tokenizer, translator)；原模型保留给 fp32 引擎使用
+    def load():
+        import torch
+        tokenizer, translator = get_translator(pair)
+        return tokenizer, torch.quantization.quantize_dynamic(translator, {torch.nn.Linear}, dtype=torch.qint8)
+    return registry.get(('marian-int8', pair), load, module_size)
+
+def get_ct2_translator(pair=default_language_pair, compute_type='int8', threads=0):
+    # 返回 (tokenizer, ctranslate2.Translator)；threads 为 0 时由 CTranslate2 自行决定
+    def load():
+        import ctranslate2
+        from transformers import MarianTokenizer
+        tokenizer = MarianTokenizer.from_pretrained(translator_configs[pair])
+        translator = ctranslate2.Translator(ct2_model_paths[pair], device='cpu', compute_type=compute_type,
+                                            intra_threads=threads)
+        return tokenizer, translator
+    return registry.get(('ct2', pair, compute_type, threads), load, lambda loaded: dir_size(ct2_model_paths[pair]))
+
+def warm_up(langs=('english',), pairs=(default_language_pair,), on_done=None, engines=()):
+    # 在后台线程中预加载模型，加载完成（或失败）后回调 on_done(error)
+    # pairs 为翻译语言对，engines 为要为这些语言对预加载的翻译引擎名，不指定时加载 MarianMT 模型
+    def run():
+        error = None
+        try:
+            for lang in langs:
+                get_vosk_model(lang)
+            from .engines import get_engine
+            for pair in pairs:
+                if not engines:
+                    get_translator(pair)
+                for name in engines:
+                    get_engine(name).load(pair)
+        except Exception as e:
+            error = e
+            logger.exception('模型预加载失败: %s', e)
+        if on_done is not None:
+            on_done(error)
+    thread = threading.Thread(target=run, name='model-warm-up', daemon=True)
+    thread.start()
+    return thread
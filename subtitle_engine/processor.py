@@ -0,0 +1,458 @@
+# 语音识别处理器：从音频环形缓冲区中取数据送入 Vosk，识别结果交给翻译工作线程，
+# 不依赖任何界面库，可在命令行或其他程序中直接使用
+import json, logging, threading, time
+import numpy as np
+from . import models
+from .engines import get_engine
+from .metrics import metrics as default_metrics
+from .history import History
+from .ringbuffer import AudioRingBuffer
+from .signals import Signal
+from .vad import create_vad
+from .translation import TranslationWorker, translate_batch, translate_stream, translation_cache
+
+try:
+    import pyaudio
+    PA_CONTINUE = pyaudio.paContinue
+    PA_INPUT_OVERFLOW = pyaudio.paInputOverflow
+except ImportError:
+    # 不使用麦克风采集（例如回放录音文件）时无需安装 PyAudio
+    PA_CONTINUE = 0
+    PA_INPUT_OVERFLOW = 2
+
+logger = logging.getLogger(__name__)
+
+class AudioProcessor:
+    # 信号：text_ready(str), translation_ready(str, int), sentence_finished(str, str),
+    # history_added(str, str) 仅在新句子加入历史记录时发出，
+    # language_changed(str, str) 在识别语言或翻译语言对实际切换后（或切换失败时）发出当前的 (识别语言, 语言对)
+    # 内存中的 history 只保留最近 history_limit 句，完整记录通过 attach_store 写入 TranscriptStore，
+    # 未接入记录库时被淘汰的句子追加到 history_spill_path（如果指定）
+    # 同时采集多路音频时，每路一个 AudioProcessor：识别模型由 models 模块共享，各自只创建识别器；
+    # 传入同一个 translation_pool 即共享翻译线程，name 用于区分各路的指标
+    # vad: 识别前的语音活动检测（'energy'、'webrtc'、'auto'，None 表示不检测），静音块不送入 Vosk；
+    # 语音结束 vad_hangover 秒（音频时间）后仍无完整结果时强制结束当前语句
+    # 音频回调与识别线程之间是固定大小的环形缓冲区（buffer_seconds 秒），识别跟不上时不会无限积压：
+    # catch_up='drop_oldest' 只丢弃已被覆盖的最旧音频；'fast_forward' 在积压超过 max_backlog 秒时
+    # 直接跳到最新的一块，优先保证字幕实时。frames_per_buffer 为每次回调（也是每次识别）的帧数，
+    # 越小延迟越低、调用开销越大
+    # language_pair: 翻译语言对（如 'en-zh'），None 表示默认语言对；识别语言与语言对都可以在运行中切换
+    # isolate=True 时识别器在子进程中运行（见 workers 模块），构造时即启动子进程加载模型，
+    # 识别进程启动（或崩溃后重启）完成前的音频跳过，计入 audio_dropped_seconds_total
+    def __init__(self, source_lang='english', metrics=None, history_limit=500, history_spill_path=None,
+                 name=None, translation_pool=None, vad='energy', vad_hangover=0.8, frames_per_buffer=8000,
+                 buffer_seconds=10.0, catch_up='drop_oldest', max_backlog=2.0, language_pair=None, isolate=False):
+        self.text_ready = Signal()
+        self.translation_ready = Signal()
+        self.sentence_finished = Signal()
+        self.history_added = Signal()
+        self.language_changed = Signal()
+        self.source_lang = source_lang
+        self.language_pair = language_pair or models.default_language_pair
+        # 切换识别语言：requested_lang 为正在后台加载的语言，加载完成后 ready_lang 由处理线程取走并换用
+        self.swap_lock = threading.Lock()
+        self.requested_lang = None
+        self.ready_lang = None
+        self.ready_pair = None           # 与 ready_lang 一起换用的语言对，其翻译模型也已加载
+        self.prepared_recognizer = None  # 隔离模式下已在后台启动好的新语言识别进程
+        self.requested_pair = None       # 正在后台加载翻译模型的语言对
+        self.name = name
+        self.sample_rate = 16000
+        self.metrics = metrics or default_metrics
+        self.isolate = isolate
+        # 在处理线程中首次使用时创建，模型按需加载；隔离模式下提前启动子进程，与界面启动并行加载模型
+        self.recognizer = self.create_recognizer() if isolate else None
+        if catch_up not in ('drop_oldest', 'fast_forward'):
+            raise ValueError(f'未知的追赶策略: {catch_up}')
+        self.frames_per_buffer = frames_per_buffer
+        self.buffer_seconds = buffer_seconds
+        self.catch_up = catch_up
+        self.max_backlog = max_backlog
+        self.audio_buffer = AudioRingBuffer(int(buffer_seconds * self.sample_rate))
+        # 暂停/恢复通过条件变量通知，暂停时处理线程休眠而不是空转
+        self.state_cond = threading.Condition()
+        self.paused = True
+        self.is_running = True  # 修改为True
+        self.is_paused = True  # 保持为True
+        self.history = History(history_limit, history_spill_path)
+        self.store = None
+        self.session_id = None
+        # 以下时间均为音频时间（秒）：按送入的音频时长累计，与墙钟无关，回放时分段结果可复现
+        self.audio_time = 0.0
+        self.last_speech_time = 0.0
+        self.silence_threshold = 3
+        self.vad_kind = vad
+        self.vad = None  # 与识别器一样在处理线程中创建，使用当时的采样率
+        self.vad_hangover = vad_hangover
+        self.in_speech = False
+        self.last_voice_time = 0.0
+        self.preroll = None       # 最近一块被跳过的静音，语音开始时先送入，避免丢掉开头
+        self.time_offset = 0.0    # 识别器时间戳加上该值即为音频时间（扣除了跳过的静音）
+        self.accumulated_text = ""
+        self.accumulated_meta = None
+        self.utterance_id = 0  # 当前语句编号，每得到一个完整句子加一
+        self.translation_engine = "MT"  # 默认使用MT引擎
+        # 翻译在独立线程中进行，识别线程只负责投递
+        self.translation_worker = TranslationWorker(
+            translate_batch, self.handle_translation,
+            translate_stream_func=translate_stream, on_progress=self.handle_translation_progress,
+            metrics=self.metrics, pool=translation_pool, name=name,
+            context_func=lambda job: self.history.recent(models.llm_context_sentences))
+        self.translation_worker.start()
+        self.stream_labels = {'stream': name} if name else None
+        self.metrics.gauge('audio_buffer_seconds', self.stream_labels,
+                           func=lambda: self.audio_buffer.backlog() / self.sample_rate)
+
+    @property
+    def channels(self):
+        # 输入声道数，大于1时才做下混
+        return self.audio_buffer.frame_bytes // 2
+
+    @channels.setter
+    def channels(self, channels):
+        # 每帧大小随声道数变化，需在开始采集前设置
+        self.audio_buffer = AudioRingBuffer(int(self.buffer_seconds * self.sample_rate), 2 * channels)
+
+    @property
+    def is_paused(self):
+        return self.paused
+
+    @is_paused.setter
+    def is_paused(self, paused):
+        with self.state_cond:
+            self.paused = paused
+            self.state_cond.notify_all()
+
+    def wait_until_active(self):
+        # 暂停期间阻塞，直到恢复或停止
+        with self.state_cond:
+            while self.paused and self.is_running:
+                self.state_cond.wait()
+
+    def create_recognizer(self, lang=None):
+        # 输出词级时间戳与置信度，用于保存到记录库
+        if self.isolate:
+            from .workers import RecognizerProcess
+            return RecognizerProcess(lang or self.source_lang, self.sample_rate, words=True, metrics=self.metrics)
+        recognizer = models.create_recognizer(lang or self.source_lang, self.sample_rate)
+        recognizer.SetWords(True)
+        return recognizer
+
+    def set_source_language(self, lang):
+        # 可在任意线程调用：新的识别模型和随之使用的语言对（pair_for）的翻译模型都在后台加载，
+        # 期间音频仍由原来的识别器处理、仍按原来的语言对翻译；两者都加载完成后由处理线程在
+        # 两块音频之间结束当前语句并换用新的识别器和语言对，不丢音频，翻译线程也不会因为加载模型而阻塞
+        if lang not in models.vosk_model_paths:
+            raise ValueError(f'未配置的识别语言: {lang}')
+        with self.swap_lock:
+            pair = models.pair_for(lang, self.language_pair)
+            self.requested_lang = lang
+            self.ready_lang = None
+            self.requested_pair = None  # 切换识别语言时语言对随之确定，取消尚未完成的语言对切换
+            stale, self.prepared_recognizer = self.prepared_recognizer, None
+            if self.recognizer is None:
+                # 还没有开始识别，首次创建识别器时直接使用新语言
+                self.source_lang = lang
+                self.language_pair = pair
+        if stale is not None:
+            stale.close()
+        if self.isolate:
+            threading.Thread(target=self.prepare_recognizer, args=(lang, pair), name='recognizer-start',
+                             daemon=True).start()
+        else:
+            models.warm_up(langs=(lang,), pairs=(pair,), engines=(self.translation_engine,),
+                           on_done=lambda error: self.source_model_loaded(lang, pair, error))
+
+    def prepare_recognizer(self, lang, pair):
+        # 隔离模式：在后台启动新语言的识别进程并等待模型加载完成，主进程不加载识别模型；
+        # 翻译引擎的模型同样在（引擎所在的进程中）加载好之后才换用
+        recognizer = self.create_recognizer(lang)
+        try:
+            recognizer.wait_ready()
+            get_engine(self.translation_engine).load(pair)
+        except Exception as e:
+            recognizer.close()
+            self.source_model_loaded(lang, pair, e)
+        else:
+            self.source_model_loaded(lang, pair, None, recognizer)
+
+    def source_model_loaded(self, lang, pair, error, recognizer=None):
+        # 由预加载线程回调
+        with self.swap_lock:
+            current = self.requested_lang == lang
+            if current and error is None:
+                self.ready_lang = lang
+                self.ready_pair = pair
+                self.prepared_recognizer = recognizer
+            elif current:
+                logger.error('识别语言 %s（语言对 %s）的模型加载失败，继续使用 %s: %s', lang, pair,
+                             self.source_lang, error)
+                self.requested_lang = None
+        if not current and recognizer is not None:
+            recognizer.close()  # 已经又切换到其他语言
+
+    def swap_recognizer(self, enqueue_time):
+        # 在处理线程中调用，换用已加载好的识别语言
+        with self.swap_lock:
+            lang = self.ready_lang
+            if lang is None:
+                return
+            pair = self.ready_pair
+            self.ready_lang = None
+            self.requested_lang = None
+            recognizer, self.prepared_recognizer = self.prepared_recognizer, None
+        if self.recognizer is not None:
+            # 原来的识别器中尚未结束的语句作为完整句子输出
+            self.handle_result(json.loads(self.recognizer.FinalResult()), enqueue_time)
+            if self.isolate:
+                self.recognizer.close()
+        self.source_lang = lang
+        self.language_pair = pair
+        self.recognizer = recognizer or self.create_recognizer()
+        self.time_offset = self.audio_time
+        logger.info('识别语言已切换为 %s，翻译语言对 %s', lang, self.language_pair)
+        self.language_changed.emit(self.source_lang, self.language_pair)
+
+    def set_language_pair(self, pair):
+        # 切换翻译语言对：当前引擎的模型在后台加载，加载完成后才换用新的语言对，期间仍按原来的语言对翻译，
+        # 翻译线程不会因为加载模型而阻塞；加载失败时保持原来的语言对
+        if pair not in models.translator_configs:
+            raise ValueError(f'未配置的翻译语言对: {pair}')
+        with self.swap_lock:
+            self.requested_pair = pair
+        models.warm_up(langs=(), pairs=(pair,), engines=(self.translation_engine,),
+                       on_done=lambda error: self.pair_model_loaded(pair, error))
+
+    def pair_model_loaded(self, pair, error):
+        # 由预加载线程回调
+        with self.swap_lock:
+            if self.requested_pair != pair:
+                return  # 已经又切换到其他语言对或识别语言
+            self.requested_pair = None
+            if error is None:
+                self.language_pair = pair
+        if error is None:
+            logger.info('翻译语言对已切换为 %s', pair)
+        else:
+            logger.error('翻译语言对 %s 的模型加载失败，继续使用 %s: %s', pair, self.language_pair, error)
+        self.language_changed.emit(self.source_lang, self.language_pair)
+
+    def attach_store(self, store, session_id):
+        self.store = store
+        self.session_id = session_id
+        self.history.attach_store(store, session_id)
+
+    def set_translation_engine(self, engine):
+        get_engine(engine)  # 未注册的引擎名直接报错
+        self.translation_engine = engine
+
+    def audio_callback(self, in_data, frame_count, time_info, status):
+        # 在 PortAudio 线程中调用，只做一次内存拷贝，不分配也不等待
+        if status and status & PA_INPUT_OVERFLOW:
+            self.metrics.inc('audio_input_overflow_total', self.stream_labels)
+        if not self.is_paused:
+            self.audio_buffer.write(in_data)
+        return (None, PA_CONTINUE)
+
+    def read_audio(self, timeout=0.1):
+        # 从环形缓冲区读取一块音频，返回 (估算的写入时间, 数据)，超时返回 None
+        # 被覆盖或快进跳过的音频按时长计入音频时间，识别器时间戳的偏移随之增加
+        max_backlog = int(self.max_backlog * self.sample_rate) if self.catch_up == 'fast_forward' else None
+        chunk = self.audio_buffer.read(self.frames_per_buffer, timeout, max_backlog)
+        if chunk is None:
+            return None
+        audio_data, dropped, behind = chunk
+        if dropped:
+            dropped_seconds = dropped / self.sample_rate
+            self.audio_time += dropped_seconds
+            self.time_offset += dropped_seconds
+            self.metrics.inc('audio_dropped_seconds_total', dict(self.stream_labels or {}, policy=self.catch_up),
+                             dropped_seconds)
+            logger.warning('识别跟不上音频输入，丢弃 %.2f 秒音频', dropped_seconds)
+        return self.audio_buffer.last_write_time - behind / self.sample_rate, audio_data
+
+    def process_audio(self):
+        while self.is_running:
+            if self.is_paused:
+                self.wait_until_active()
+                continue
+            try:
+                chunk = self.read_audio()
+                if chunk is None:
+                    continue
+                enqueue_time, audio_data = chunk
+                self.metrics.observe('audio_queue_wait_seconds', time.monotonic() - enqueue_time)
+                if self.ready_lang is not None:
+                    self.swap_recognizer(enqueue_time)
+                if self.recognizer is None:
+                    self.recognizer = self.create_recognizer()
+                    self.time_offset = self.audio_time
+                if self.vad is None and self.vad_kind:
+                    self.vad = create_vad(self.vad_kind, self.sample_rate)
+                # 单声道 int16 数据直接交给识别器，不做任何拷贝；多声道时才下混
+                if self.channels > 1:
+                    pcm_data = np.frombuffer(audio_data, dtype=np.int16).reshape(-1, self.channels)
+                    audio_data = pcm_data.mean(axis=1).astype(np.int16).tobytes()
+
+                if len(audio_data) > 0:
+                    chunk_start = self.audio_time
+                    chunk_seconds = len(audio_data) / 2 / self.sample_rate
+                    self.audio_time += chunk_seconds
+                    if self.vad is None or self.detect_speech(audio_data, chunk_start, chunk_seconds):
+                        self.recognize(audio_data, enqueue_time)
+                        if self.vad is not None and self.audio_time - self.last_voice_time >= self.vad_hangover:
+                            # 语音结束超过 hangover 仍未得到完整结果，强制结束当前语句
+                            self.in_speech = False
+                            self.handle_result(json.loads(self.recognizer.FinalResult()), enqueue_time)
+
+                # 检查是否超过静默阈值
+                time_diff = self.audio_time - self.last_speech_time
+                if time_diff >= self.silence_threshold and self.accumulated_text:
+                    # 累积的文本交给翻译线程收尾，这里直接清空
+                    self.translation_worker.submit('flush', self.accumulated_text, self.translation_engine,
+                                                   meta=self.accumulated_meta, pair=self.language_pair)
+                    self.accumulated_text = ""
+                    self.last_speech_time = self.audio_time
+
+            except Exception as e:
+                logger.exception('处理错误: %s', e)
+                self.metrics.inc('errors_total', {'stage': 'recognition'})
+                continue
+
+    def detect_speech(self, audio_data, chunk_start, chunk_seconds):
+        # 返回该块是否需要送入识别器：含有语音，或仍在语音结束后的 hangover 之内
+        voiced = self.vad.speech_frames(np.frombuffer(audio_data, dtype=np.int16))
+        if voiced.any():
+            self.last_voice_time = chunk_start + self.vad.voice_end(voiced)
+            if not self.in_speech:
+                self.in_speech = True
+                if self.preroll is not None:
+                    # 语音开头可能落在上一块的末尾
+                    preroll_data, preroll_seconds, preroll_enqueue = self.preroll
+                    self.time_offset -= preroll_seconds
+                    self.recognize(preroll_data, preroll_enqueue)
+            self.preroll = None
+            return True
+        if self.in_speech:
+            return True
+        # 静音：不送入识别器，识别器时间戳与音频时间之间的偏移随之增加
+        self.preroll = (audio_data, chunk_seconds, time.monotonic())
+        self.time_offset += chunk_seconds
+        self.metrics.inc('vad_skipped_seconds_total', amount=chunk_seconds)
+        return False
+
+    def recognize(self, audio_data, enqueue_time):
+        if self.isolate and not self.recognizer.is_ready():
+            # 识别进程正在启动或崩溃后重启：跳过这块音频，不阻塞处理线程；新进程的时间戳从之后的音频算起
+            self.time_offset = self.audio_time
+            self.metrics.inc('audio_dropped_seconds_total', dict(self.stream_labels or {}, policy='recognizer_start'),
+                             len(audio_data) / 2 / self.sample_rate)
+            return
+        decode_start = time.perf_counter()
+        is_final = self.recognizer.AcceptWaveform(audio_data)
+        self.metrics.observe('recognizer_decode_seconds', time.perf_counter() - decode_start)
+        if is_final:
+            self.handle_result(json.loads(self.recognizer.Result()), enqueue_time)
+        else:
+            partial = json.loads(self.recognizer.PartialResult())
+            if partial.get('partial', ''):
+                text = partial['partial']
+                if text.strip():
+                    self.last_speech_time = self.audio_time
+                    self.text_ready.emit(text)
+                    # 对部分识别结果也进行实时翻译，但不添加到历史记录
+                    self.translation_worker.submit('partial', text, self.translation_engine, self.utterance_id,
+                                                   pair=self.language_pair)
+
+    def handle_result(self, result, enqueue_time):
+        # 处理一个完整句子的识别结果
+        if result.get('text', ''):
+            text = result['text']
+            if text.strip():
+                self.last_speech_time = self.audio_time
+                self.accumulated_text = text
+                self.accumulated_meta = self.utterance_meta(result, enqueue_time, self.time_offset)
+                self.text_ready.emit(text)
+                # 投递到翻译队列，识别线程不等待翻译结果
+                self.translation_worker.submit('final', text, self.translation_engine, self.utterance_id,
+                                               self.accumulated_meta, self.language_pair)
+                self.utterance_id += 1
+
+    @staticmethod
+    def utterance_meta(result, enqueue_time, time_offset=0.0):
+        # 从 Vosk 结果中提取句子的起止时间（音频时间，秒）和平均置信度
+        words = result.get('result') or []
+        meta = {'recognition_latency': time.monotonic() - enqueue_time}
+        if words:
+            meta['start_time'] = words[0].get('start') + time_offset
+            meta['end_time'] = words[-1].get('end') + time_offset
+            meta['confidence'] = sum(word.get('conf', 0.0) for word in words) / len(words)
+        return meta
+
+    def handle_translation(self, job, translation, skipped):
+        # 由翻译线程回调，只有在成功获得翻译结果后才发送信号和更新历史记录
+        if not translation or not translation.strip():
+            return
+        text = job.text
+        if job.kind != 'flush':
+            # 同时报告该语句被跳过的部分结果数量
+            self.translation_ready.emit(translation, skipped)
+        if job.kind != 'partial':
+            self.sentence_finished.emit(text, translation)
+            # 只在这里添加到历史记录，按哈希索引去重
+            if self.history.add(text, translation):
+                self.save_utterance(job, translation)
+                self.history_added.emit(text, translation)
+
+    def save_utterance(self, job, translation):
+        if self.store is None:
+            return
+        try:
+            self.store.add_utterance(self.session_id, job.text, translation, engine=job.engine,
+                                     translation_latency=time.monotonic() - job.submit_time,
+                                     **(job.meta or {}))
+        except Exception as e:
+            logger.exception('保存到记录库失败: %s', e)
+            self.metrics.inc('errors_total', {'stage': 'store'})
+
+    def get_history(self, offset=0, limit=-1):
+        # 有记录库时从库中读取完整历史，否则只能返回内存中保留的最近部分
+        if self.store is not None:
+            return [(row['source'], row['translation'])
+                    for row in self.store.get_utterances(self.session_id, offset, limit)]
+        history = list(self.history)[offset:]
+        return history if limit < 0 else history[:limit]
+
+    def handle_translation_progress(self, job, translation, skipped):
+        # 流式翻译的中间结果只更新实时译文
+        if translation and translation.strip():
+            self.translation_ready.emit(translation, skipped)
+
+    def get_translation_stats(self):
+        stats = self.translation_worker.get_stats()
+        stats['cache'] = translation_cache.get_stats()
+        return stats
+
+    def stop(self):
+        with self.state_cond:
+            self.is_running = False
+            self.paused = True
+            self.state_cond.notify_all()
+        self.translation_worker.stop()
+        if self.isolate:
+            # 停止识别子进程，处理线程之后的调用直接返回空结果
+            with self.swap_lock:
+                prepared, self.prepared_recognizer = self.prepared_recognizer, None
+            for recognizer in (self.recognizer, prepared):
+                if recognizer is not None:
+                    recognizer.close()
+
+    def pause(self):
+        self.is_paused = True
+
+    def resume(self):
+        self.is_paused = False
+
+    def clear_history(self):
+        self.history.clear()
+        self.accumulated_text = ""
@@ -0,0 +1,90 @@
+# 音频环形缓冲区：PortAudio 回调线程写入、识别线程读取（单生产者单消费者），内存在创建时一次分配
+# 写入方从不等待也不加锁，只推进自己的写入计数；读取方落后超过容量时，最旧的音频已被覆盖，
+# 读取时跳过并计入 overrun。读写计数按帧单调递增，读取方根据两者之差判断积压和覆盖
+import threading, time
+
+class AudioRingBuffer:
+    # capacity: 容量（帧）；frame_bytes: 每帧字节数（int16 时为 2 × 声道数）
+    def __init__(self, capacity, frame_bytes=2):
+        self.capacity = capacity
+        self.frame_bytes = frame_bytes
+        self.size = capacity * frame_bytes
+        self.data = bytearray(self.size)
+        self.view = memoryview(self.data)
+        self.written = 0     # 累计写入的帧数，只由写入方修改
+        self.read_pos = 0    # 累计读到的帧数，只由读取方修改
+        self.last_write_time = 0.0
+        self.overrun_frames = 0    # 被覆盖而未读到的帧数
+        self.skipped_frames = 0    # 读取方主动跳过（快进追赶）的帧数
+        self.readable = threading.Event()
+
+    def write(self, data):
+        # 在音频回调中调用，只做一次（回绕时两次）内存拷贝；超过容量的部分只保留最新的
+        count = len(data) // self.frame_bytes
+        if count == 0:
+            return
+        start = self.written
+        if count > self.capacity:
+            data = memoryview(data)[(count - self.capacity) * self.frame_bytes:]
+            start += count - self.capacity
+            count = self.capacity
+        offset = (start % self.capacity) * self.frame_bytes
+        length = count * self.frame_bytes
+        first = min(length, self.size - offset)
+        self.view[offset:offset + first] = memoryview(data)[:first]
+        if first < length:
+            self.view[:length - first] = memoryview(data)[first:length]
+        self.last_write_time = time.monotonic()
+        self.written = start + count
+        self.readable.set()
+
+    def backlog(self):
+        # 尚未读取的帧数（超过容量的部分已被覆盖）
+        return min(self.written - self.read_pos, self.capacity)
+
+    def read(self, max_frames, timeout=None, max_backlog=None):
+        # 读取最多 max_frames 帧，超时仍无数据时返回 None
+        # 返回 (数据, 本次跳过的帧数, 读取后仍积压的帧数)；跳过的帧包括被覆盖的和快进丢弃的
+        # max_backlog: 积压超过该帧数时直接跳到最新的 max_frames 帧（快进追赶），None 表示不快进
+        dropped = 0
+        while True:
+            self.readable.clear()
+            written = self.written
+            if written == self.read_pos:
+                if not self.readable.wait(timeout):
+                    return None
+                continue
+            if written - self.read_pos > self.capacity:
+                skip = written - self.read_pos - self.capacity
+                self.overrun_frames += skip
+                self.read_pos += skip
+                dropped += skip
+            if max_backlog is not None and written - self.read_pos > max(max_backlog, max_frames):
+                skip = written - self.read_pos - max_frames
+                self.skipped_frames += skip
+                self.read_pos += skip
+                dropped += skip
+            count = min(written - self.read_pos, max_frames)
+            offset = (self.read_pos % self.capacity) * self.frame_bytes
+            length = count * self.frame_bytes
+            first = min(length, self.size - offset)
+            chunk = bytes(self.view[offset:offset + first])
+            if first < length:
+                chunk += bytes(self.view[:length - first])
+            if self.written - self.read_pos > self.capacity:
+                # 拷贝期间写入方追上并覆盖了这段数据，重新按覆盖处理
+                continue
+            self.read_pos += count
+            return chunk, dropped, written - self.read_pos
+
+    def clear(self):
+        # 由读取方调用，丢弃所有积压（不计入 overrun）
+        self.read_pos = self.written
+
+    def get_stats(self):
+        return {
+            'capacity': self.capacity,
+            'backlog': self.backlog(),
+            'overrun_frames': self.overrun_frames,
+            'skipped_frames': self.skipped_frames,
+        }
@@ -0,0 +1,299 @@
+# 字幕广播服务：订阅处理器的信号，把实时字幕、译文和整句通过 SSE / WebSocket 推送给浏览器或 OBS 叠加层
+# 服务在独立线程的 asyncio 事件循环中运行，处理器线程只做一次线程安全的投递，不会被慢客户端拖慢
+# 每个客户端有自己的有界缓冲区，积压时丢弃最旧的消息；所有消息带递增的偏移量，可从任意偏移量回放
+#   GET /            简单的字幕叠加页面
+#   GET /events      SSE，可用 ?offset=N 或 Last-Event-ID 从偏移量之后开始
+#   GET /ws          WebSocket，同样支持 ?offset=N
+#   GET /replay      JSON，?offset=N&limit=M 返回偏移量之后的消息
+import asyncio, base64, hashlib, json, logging, threading, time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+from .metrics import metrics as default_metrics
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# 客户端只会发送 ping / close 等很短的帧，超过这个长度的帧不读取，以状态码 1009 关闭连接
+MAX_CLIENT_FRAME = 4096
+
+OVERLAY_PAGE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>实时字幕</title>
+<style>
+body { margin: 0; background: transparent; font-family: sans-serif; color: #fff; text-shadow: 0 0 4px #000; }
+#box { position: fixed; bottom: 5%; width: 100%; text-align: center; }
+#original { font-size: 28px; } #translation { font-size: 36px; }
+</style></head>
+<body><div id="box"><div id="original"></div><div id="translation"></div></div>
+<script>
+const source = new EventSource('/events');
+source.onmessage = (e) => {
+  const event = JSON.parse(e.data);
+  if (event.type === 'text') document.getElementById('original').textContent = event.text;
+  if (event.type === 'translation') document.getElementById('translation').textContent = event.translation;
+  if (event.type === 'sentence') {
+    document.getElementById('original').textContent = event.text;
+    document.getElementById('translation').textContent = event.translation;
+  }
+};
+</script></body></html>
+'''
+
+class Client:
+    def __init__(self, buffer_size):
+        self.buffer = deque(maxlen=buffer_size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, event):
+        # 缓冲区已满时丢弃最旧的一条，返回是否发生了丢弃
+        full = len(self.buffer) == self.buffer.maxlen
+        if full:
+            self.dropped += 1
+        self.buffer.append(event)
+        self.ready.set()
+        return full
+
+    async def next_events(self):
+        await self.ready.wait()
+        self.ready.clear()
+        events = list(self.buffer)
+        self.buffer.clear()
+        return events
+
+class SubtitleServer:
+    # buffer_size: 每个客户端最多积压的消息数；history_size: 保留多少条消息用于回放
+    # write_timeout: 客户端多少秒内不接收数据即断开
+    def __init__(self, host='127.0.0.1', port=8765, buffer_size=256, history_size=10000, write_timeout=10.0,
+                 metrics=None):
+        self.host = host
+        self.port = port
+        self.buffer_size = buffer_size
+        self.write_timeout = write_timeout
+        self.history = deque(maxlen=history_size)  # (偏移量, 编码后的 JSON)
+        self.offset = 0
+        self.clients = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+        self.stats = {'published': 0, 'dropped': 0, 'connections': 0}  # dropped 只含已断开的客户端
+        self.metrics = metrics or default_metrics
+        self.metrics.gauge('broadcast_clients', func=lambda: len(self.clients))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='subtitle-server', daemon=True)
+        self.thread.start()
+        self.started.wait()
+        return self
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle_connection, self.host, self.port, backlog=1024))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            # 停止时断开所有仍在推送的连接
+            self.server.close()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def stop(self):
+        if self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop = None
+
+    def attach(self, processor, stream=None):
+        # 订阅处理器的信号；多路输入时 stream 用于区分来源
+        extra = {'stream': stream} if stream else {}
+        processor.text_ready.connect(lambda text: self.publish('text', text=text, **extra))
+        processor.translation_ready.connect(
+            lambda translation, skipped: self.publish('translation', translation=translation, **extra))
+        processor.sentence_finished.connect(
+            lambda text, translation: self.publish('sentence', text=text, translation=translation, **extra))
+
+    def publish(self, kind, **fields):
+        # 可在任意线程调用，只把消息交给事件循环
+        if self.loop is None:
+            return
+        event = dict(fields, type=kind, time=time.time())
+        try:
+            self.loop.call_soon_threadsafe(self.dispatch, event)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+
+    def dispatch(self, event):
+        # 在事件循环线程中执行：分配偏移量，编码一次后分发给所有客户端
+        self.offset += 1
+        event['offset'] = self.offset
+        entry = (self.offset, json.dumps(event, ensure_ascii=False))
+        self.history.append(entry)
+        self.stats['published'] += 1
+        dropped = sum(client.push(entry) for client in self.clients)
+        if dropped:
+            self.metrics.inc('broadcast_dropped_total', amount=dropped)
+
+    def replay(self, offset, limit=None):
+        entries = [entry for entry in self.history if entry[0] > offset]
+        return entries if limit is None else entries[:limit]
+
+    def get_stats(self):
+        clients = list(self.clients)
+        stats = dict(self.stats)
+        stats['dropped'] += sum(client.dropped for client in clients)
+        stats['clients'] = len(clients)
+        stats['offset'] = self.offset
+        return stats
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] != 'GET':
+                await self.respond(writer, 405, 'text/plain', b'method not allowed')
+                return
+            url = urlsplit(parts[1])
+            query = parse_qs(url.query)
+            try:
+                offset = int(query.get('offset', [headers.get('last-event-id', '-1')])[0] or -1)
+                limit = int(query['limit'][0]) if 'limit' in query else None
+            except ValueError:
+                await self.respond(writer, 400, 'text/plain', b'offset, limit and Last-Event-ID must be integers')
+                return
+            if url.path == '/events':
+                await self.serve_sse(writer, offset)
+            elif url.path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+                await self.serve_websocket(reader, writer, headers, offset)
+            elif url.path == '/replay':
+                body = '[' + ','.join(data for _, data in self.replay(offset, limit)) + ']'
+                await self.respond(writer, 200, 'application/json; charset=utf-8', body.encode('utf-8'))
+            elif url.path == '/':
+                await self.respond(writer, 200, 'text/html; charset=utf-8', OVERLAY_PAGE.encode('utf-8'))
+            else:
+                await self.respond(writer, 404, 'text/plain', b'not found')
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except asyncio.CancelledError:
+            pass  # 服务停止
+        except Exception as e:
+            logger.exception('广播连接错误: %s', e)
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, content_type, body):
+        reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+        writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n'
+                     f'Content-Length: {len(body)}\r\nAccess-Control-Allow-Origin: *\r\n'
+                     f'Connection: close\r\n\r\n'.encode('latin-1') + body)
+        await asyncio.wait_for(writer.drain(), self.write_timeout)
+
+    def subscribe(self, offset):
+        # 先放入需要回放的消息，再接收新的消息；回放内容超过缓冲区时只保留最新的部分
+        client = Client(self.buffer_size)
+        if offset >= 0:
+            client.buffer.extend(self.replay(offset)[-self.buffer_size:])
+            client.ready.set()
+        self.clients.add(client)
+        self.stats['connections'] += 1
+        return client
+
+    def unsubscribe(self, client):
+        self.clients.discard(client)
+        self.stats['dropped'] += client.dropped
+
+    async def serve_sse(self, writer, offset):
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n'
+                     b'Cache-Control: no-cache\r\nAccess-Control-Allow-Origin: *\r\n\r\n')
+        client = self.subscribe(offset)
+        try:
+            while True:
+                events = await client.next_events()
+                writer.write(''.join(f'id: {index}\ndata: {data}\n\n' for index, data in events).encode('utf-8'))
+                await asyncio.wait_for(writer.drain(), self.write_timeout)
+        finally:
+            self.unsubscribe(client)
+
+    async def serve_websocket(self, reader, writer, headers, offset):
+        key = headers.get('sec-websocket-key')
+        if not key:
+            await self.respond(writer, 400, 'text/plain', b'missing Sec-WebSocket-Key')
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest())
+        writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                     b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        client = self.subscribe(offset)
+        # 读取客户端的帧只为响应 ping 和 close，客户端发送的其他内容忽略
+        reading = asyncio.ensure_future(self.read_websocket(reader, writer))
+        try:
+            while not reading.done():
+                waiting = asyncio.ensure_future(client.next_events())
+                done, _ = await asyncio.wait({waiting, reading}, return_when=asyncio.FIRST_COMPLETED)
+                if waiting not in done:
+                    waiting.cancel()
+                    break
+                for _, data in waiting.result():
+                    writer.write(websocket_frame(0x1, data.encode('utf-8')))
+                await asyncio.wait_for(writer.drain(), self.write_timeout)
+        finally:
+            reading.cancel()
+            self.unsubscribe(client)
+
+    async def read_websocket(self, reader, writer):
+        while True:
+            try:
+                opcode, payload = await read_websocket_frame(reader, MAX_CLIENT_FRAME)
+            except FrameTooLarge as e:
+                logger.warning('WebSocket 客户端发送的帧过大（%d 字节），关闭连接', e.args[0])
+                writer.write(websocket_frame(0x8, (1009).to_bytes(2, 'big')))
+                return
+            if opcode == 0x8:
+                writer.write(websocket_frame(0x8, payload[:2]))
+                return
+            if opcode == 0x9:
+                writer.write(websocket_frame(0xA, payload))
+
+def websocket_frame(opcode, payload):
+    # 服务端发送的帧不加掩码
+    length = len(payload)
+    if length < 126:
+        header = bytes([0x80 | opcode, length])
+    elif length < 65536:
+        header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, 'big')
+    else:
+        header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, 'big')
+    return header + payload
+
+class FrameTooLarge(Exception):
+    pass
+
+async def read_websocket_frame(reader, max_length=None):
+    # 长度由对端给出，指定 max_length 且超过时在读取内容之前抛出 FrameTooLarge
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = int.from_bytes(await reader.readexactly(2), 'big')
+    elif length == 127:
+        length = int.from_bytes(await reader.readexactly(8), 'big')
+    if max_length is not None and length > max_length:
+        raise FrameTooLarge(length)
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return first & 0x0F, payload
@@ -0,0 +1,25 @@
+# 不依赖 Qt 的简单信号：回调在发出信号的线程中同步执行，
+# 界面层需要自行把回调转发到界面线程（见 app.py 中的 ProcessorSignals）
+import logging, threading
+
+logger = logging.getLogger(__name__)
+
+class Signal:
+    def __init__(self):
+        self.slots = []
+        self.lock = threading.Lock()
+
+    def connect(self, slot):
+        with self.lock:
+            self.slots = self.slots + [slot]
+
+    def disconnect(self, slot):
+        with self.lock:
+            self.slots = [s for s in self.slots if s != slot]
+
+    def emit(self, *args):
+        for slot in self.slots:
+            try:
+                slot(*args)
+            except Exception as e:
+                logger.exception('信号处理错误: %s', e)
@@ -0,0 +1,244 @@
+# 结构化的字幕记录库（SQLite）：按会话保存每一句的时间、原文、译文、引擎、延迟和置信度，
+# 支持跨会话全文检索，并可导出为 TXT / SRT / VTT / CSV
+# 命令行: python -m subtitle_engine.store sessions | search <关键词> | export <会话ID> <文件>
+import argparse, logging, os, sqlite3, sys, threading, time
+from . import models
+from .history import text_digest
+from .subtitles import SUBTITLE_WRITERS, to_txt
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    ended_at REAL,
+    source_lang TEXT,
+    target_lang TEXT,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS utterances (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    created_at REAL NOT NULL,
+    start_time REAL,
+    end_time REAL,
+    source TEXT NOT NULL,
+    translation TEXT,
+    engine TEXT,
+    recognition_latency REAL,
+    translation_latency REAL,
+    confidence REAL,
+    source_hash INTEGER
+);
+CREATE INDEX IF NOT EXISTS utterances_session ON utterances (session_id, id);
+'''
+
+FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS utterances_fts USING fts5(
+    source, translation, content='utterances', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS utterances_ai AFTER INSERT ON utterances BEGIN
+    INSERT INTO utterances_fts (rowid, source, translation) VALUES (new.id, new.source, new.translation);
+END;
+CREATE TRIGGER IF NOT EXISTS utterances_ad AFTER DELETE ON utterances BEGIN
+    INSERT INTO utterances_fts (utterances_fts, rowid, source, translation)
+    VALUES ('delete', old.id, old.source, old.translation);
+END;
+'''
+
+UTTERANCE_FIELDS = ('id', 'session_id', 'created_at', 'start_time', 'end_time', 'source', 'translation',
+                    'engine', 'recognition_latency', 'translation_latency', 'confidence')
+
+class TranscriptStore:
+    def __init__(self, path):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        if path != ':memory:':
+            # WAL 模式下写入不阻塞同时进行的检索
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(utterances)')]
+        if 'source_hash' not in columns:
+            # 兼容早期没有 source_hash 列的数据库
+            self.db.execute('ALTER TABLE utterances ADD COLUMN source_hash INTEGER')
+        self.db.execute('CREATE INDEX IF NOT EXISTS utterances_hash ON utterances (session_id, source_hash)')
+        try:
+            self.db.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite 未编译 FTS5 时退回到 LIKE 查询
+            self.has_fts = False
+        self.db.commit()
+
+    def start_session(self, source_lang=None, target_lang=None, title=None):
+        with self.lock:
+            cursor = self.db.execute(
+                'INSERT INTO sessions (started_at, source_lang, target_lang, title) VALUES (?, ?, ?, ?)',
+                (time.time(), source_lang, target_lang, title))
+            self.db.commit()
+            return cursor.lastrowid
+
+    def update_session(self, session_id, source_lang=None, target_lang=None):
+        # 会话中途切换语言后记录当前的识别语言与目标语言
+        with self.lock:
+            self.db.execute('UPDATE sessions SET source_lang = COALESCE(?, source_lang), '
+                            'target_lang = COALESCE(?, target_lang) WHERE id = ?',
+                            (source_lang, target_lang, session_id))
+            self.db.commit()
+
+    def end_session(self, session_id):
+        with self.lock:
+            self.db.execute('UPDATE sessions SET ended_at = ? WHERE id = ?', (time.time(), session_id))
+            self.db.commit()
+
+    def add_utterance(self, session_id, source, translation, start_time=None, end_time=None, engine=None,
+                      recognition_latency=None, translation_latency=None, confidence=None):
+        with self.lock:
+            cursor = self.db.execute(
+                'INSERT INTO utterances (session_id, created_at, start_time, end_time, source, translation, '
+                'engine, recognition_latency, translation_latency, confidence, source_hash) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (session_id, time.time(), start_time, end_time, source, translation, engine,
+                 recognition_latency, translation_latency, confidence, text_digest(source)))
+            self.db.commit()
+            return cursor.lastrowid
+
+    def has_source(self, session_id, source):
+        # 通过 source_hash 索引查找，比对原文排除哈希碰撞
+        with self.lock:
+            row = self.db.execute(
+                'SELECT 1 FROM utterances WHERE session_id = ? AND source_hash = ? AND source = ? LIMIT 1',
+                (session_id, text_digest(source), source)).fetchone()
+        return row is not None
+
+    def list_sessions(self):
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT s.*, COUNT(u.id) AS utterances FROM sessions s '
+                'LEFT JOIN utterances u ON u.session_id = s.id GROUP BY s.id ORDER BY s.id').fetchall()
+        return [dict(row) for row in rows]
+
+    def get_utterances(self, session_id, offset=0, limit=-1):
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT * FROM utterances WHERE session_id = ? ORDER BY id LIMIT ? OFFSET ?',
+                (session_id, limit, offset)).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_utterances(self, session_id):
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM utterances WHERE session_id = ?',
+                                   (session_id,)).fetchone()[0]
+
+    def search(self, query, session_id=None, limit=50):
+        # 在所有会话（或指定会话）的原文与译文中检索，返回最新的匹配
+        session_filter = '' if session_id is None else ' AND u.session_id = ?'
+        with self.lock:
+            if self.has_fts:
+                # 把查询当作短语，避免用户输入被解析为 FTS 语法
+                phrase = '"' + query.replace('"', '""') + '"'
+                params = [phrase] + ([] if session_id is None else [session_id]) + [limit]
+                try:
+                    rows = self.db.execute(
+                        'SELECT u.* FROM utterances_fts f JOIN utterances u ON u.id = f.rowid '
+                        f'WHERE utterances_fts MATCH ?{session_filter} ORDER BY u.id DESC LIMIT ?',
+                        params).fetchall()
+                    # FTS 默认分词器不切分中文，按短语查不到时再用 LIKE 兜底
+                    if rows:
+                        return [dict(row) for row in rows]
+                except sqlite3.OperationalError:
+                    pass
+            pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            params = [pattern, pattern] + ([] if session_id is None else [session_id]) + [limit]
+            rows = self.db.execute(
+                "SELECT u.* FROM utterances u WHERE (u.source LIKE ? ESCAPE '\\' OR u.translation LIKE ? ESCAPE '\\')"
+                f'{session_filter} ORDER BY u.id DESC LIMIT ?', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def segments(self, session_id):
+        # 转换为 subtitles 模块使用的格式；没有音频时间的记录按会话开始后的墙钟时间估算
+        with self.lock:
+            row = self.db.execute('SELECT started_at FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        started_at = row['started_at'] if row else 0.0
+        segments = []
+        for utterance in self.get_utterances(session_id):
+            end = utterance['end_time']
+            if end is None:
+                end = utterance['created_at'] - started_at
+            start = utterance['start_time']
+            if start is None:
+                start = max(0.0, end - 2.0)
+            segments.append({
+                'start': start,
+                'end': end,
+                'text': utterance['source'],
+                'translation': utterance['translation'],
+                'engine': utterance['engine'],
+                'confidence': utterance['confidence'],
+            })
+        return segments
+
+    def session_labels(self, session_id):
+        # 会话记录的识别语言与目标语言对应的 (原文标题, 译文标题)，未记录时按默认语言对
+        with self.lock:
+            row = self.db.execute('SELECT source_lang, target_lang FROM sessions WHERE id = ?',
+                                  (session_id,)).fetchone()
+        source, target = models.pair_languages()
+        if row is not None:
+            source, target = row['source_lang'] or source, row['target_lang'] or target
+        return tuple(models.language_display_names.get(lang, lang) for lang in (source, target))
+
+    def export(self, session_id, fmt):
+        segments = self.segments(session_id)
+        if fmt == 'txt':
+            return to_txt(segments, self.session_labels(session_id))
+        return SUBTITLE_WRITERS[fmt](segments)
+
+    def export_to_file(self, session_id, path, fmt=None):
+        fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+        content = self.export(session_id, fmt)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        return path
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='查询与导出字幕记录库')
+    parser.add_argument('--db', default=os.path.join('record', 'transcripts.db'))
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('sessions', help='列出所有会话')
+    search = commands.add_parser('search', help='全文检索原文和译文')
+    search.add_argument('query')
+    search.add_argument('--session', type=int)
+    search.add_argument('--limit', type=int, default=50)
+    export = commands.add_parser('export', help='导出会话，格式由扩展名决定 (txt/srt/vtt/csv)')
+    export.add_argument('session', type=int)
+    export.add_argument('output')
+    args = parser.parse_args(argv)
+
+    store = TranscriptStore(args.db)
+    try:
+        if args.command == 'sessions':
+            for session in store.list_sessions():
+                started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(session['started_at']))
+                print(f"{session['id']}\t{started}\t{session['utterances']} 句\t{session['title'] or ''}")
+        elif args.command == 'search':
+            for row in store.search(args.query, args.session, args.limit):
+                print(f"[{row['session_id']}#{row['id']}] {row['source']}\n    {row['translation'] or ''}")
+        else:
+            print(store.export_to_file(args.session, args.output))
+    finally:
+        store.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
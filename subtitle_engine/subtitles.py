@@ -0,0 +1,67 @@
+# 字幕格式输出：segments 为按时间排序的字典列表，包含 start / end（秒）、text，
+# 可选 translation 与 words（Vosk SetWords 给出的词级时间戳）
+import csv, io
+from .models import pair_labels
+
+def format_timestamp(seconds, separator):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f'{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}'
+
+def to_srt(segments):
+    lines = []
+    for i, segment in enumerate(segments, 1):
+        lines.append(str(i))
+        lines.append(f"{format_timestamp(segment['start'], ',')} --> {format_timestamp(segment['end'], ',')}")
+        lines.append(segment['text'])
+        if segment.get('translation'):
+            lines.append(segment['translation'])
+        lines.append('')
+    return '\n'.join(lines)
+
+def to_vtt(segments):
+    lines = ['WEBVTT', '']
+    for segment in segments:
+        lines.append(f"{format_timestamp(segment['start'], '.')} --> {format_timestamp(segment['end'], '.')}")
+        # 原文使用 VTT 的行内时间戳标注每个单词的开始时间
+        words = segment.get('words')
+        if words:
+            timed = [words[0]['word']]
+            timed += [f"<{format_timestamp(word['start'], '.')}>{word['word']}" for word in words[1:]]
+            lines.append(' '.join(timed))
+        else:
+            lines.append(segment['text'])
+        if segment.get('translation'):
+            lines.append(segment['translation'])
+        lines.append('')
+    return '\n'.join(lines)
+
+def to_txt(segments, labels=None):
+    # labels: (原文标题, 译文标题)，默认按默认语言对
+    source_label, target_label = labels or pair_labels()
+    lines = []
+    for segment in segments:
+        lines.append(f"[{format_timestamp(segment['start'], '.')}]")
+        lines.append(f"{source_label}:\n{segment['text']}")
+        if segment.get('translation'):
+            lines.append(f"{target_label}:\n{segment['translation']}")
+        lines.append('')
+    return '\n'.join(lines)
+
+def to_csv(segments):
+    output = io.StringIO()
+    fields = ['start', 'end', 'text', 'translation', 'engine', 'confidence']
+    writer = csv.DictWriter(output, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for segment in segments:
+        writer.writerow({field: segment.get(field, '') for field in fields})
+    return output.getvalue()
+
+SUBTITLE_WRITERS = {
+    'srt': to_srt,
+    'vtt': to_vtt,
+    'txt': to_txt,
+    'csv': to_csv,
+}
@@ -0,0 +1,165 @@
+# 字幕记录文件的后台写入：逐句文件只追加、批量写入，按策略 fsync；
+# 全文文件的原文与译文两部分各自追加到旁路文件（与逐句文件一起落盘，崩溃时不丢记录，内存中也不保留整场记录），
+# flush / 关闭时（指定 fulltext_interval 时还会定期）由旁路文件拼接后原子地写出全文文件，关闭后删除旁路文件
+import logging, os, queue, shutil, threading, time
+from datetime import datetime
+from . import models
+
+logger = logging.getLogger(__name__)
+
+class TranscriptWriter:
+    # fsync_every: 累计多少条未落盘的记录后 fsync；fsync_interval: 有未落盘记录时最长间隔多少秒 fsync
+    # fulltext_interval: 全文文件最长多少秒重新拼接一次；拼接的开销与整场记录的长度成正比，
+    # 默认 None 只在 flush / 关闭时写出，会话进行中写入线程只做追加
+    # 每条记录带有 (原文标题, 译文标题)，默认按默认语言对；全文文件使用最近一条记录的标题
+    def __init__(self, sentence_path, fulltext_path=None, fsync_every=1, fsync_interval=1.0,
+                 fulltext_interval=None):
+        self.sentence_path = sentence_path
+        self.fulltext_path = fulltext_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.fulltext_interval = fulltext_interval
+        self.queue = queue.Queue()
+        self.file = None
+        self.parts = []       # 全文的原文、译文旁路文件
+        self.parts_empty = True
+        self.thread = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.fulltext_dirty = False
+        self.last_fulltext = time.monotonic()
+        self.labels = models.pair_labels()
+        self.stats = {'records': 0, 'writes': 0, 'fsyncs': 0, 'fulltext_writes': 0, 'errors': 0}
+
+    def start(self):
+        self.file = open(self.sentence_path, 'a', encoding='utf-8')
+        if self.fulltext_path:
+            self.parts = [open(path, 'w', encoding='utf-8') for path in self.part_paths()]
+        self.thread = threading.Thread(target=self.run, name='transcript-writer', daemon=True)
+        self.thread.start()
+        return self
+
+    def append(self, original, translated, timestamp=None, labels=None):
+        # 在调用线程中只做入队，时间戳取入队时刻；labels 为 (原文标题, 译文标题)，随语言对变化
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.queue.put(('record', timestamp, original, translated, tuple(labels or models.pair_labels())))
+
+    def flush(self, timeout=None):
+        # 等待已入队的记录写入并落盘，同时写出全文文件
+        done = threading.Event()
+        self.queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        if self.thread is None:
+            return
+        self.queue.put(('stop',))
+        self.thread.join(timeout)
+        self.thread = None
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['pending'] = self.queue.qsize()
+        return stats
+
+    def next_timeout(self):
+        deadlines = []
+        now = time.monotonic()
+        if self.unsynced:
+            deadlines.append(self.last_sync + self.fsync_interval - now)
+        if self.fulltext_dirty and self.fulltext_path and self.fulltext_interval is not None:
+            deadlines.append(self.last_fulltext + self.fulltext_interval - now)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines))
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            try:
+                items = [self.queue.get(timeout=self.next_timeout())]
+            except queue.Empty:
+                items = []
+            # 一次取出所有已排队的记录，合并为一次写入
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [item for item in items if item[0] == 'record']
+            waiters = [item[1] for item in items if item[0] == 'flush']
+            stopping = any(item[0] == 'stop' for item in items)
+            try:
+                if records:
+                    self.write_records(records)
+                force = stopping or bool(waiters)
+                if self.unsynced and (force or self.unsynced >= self.fsync_every
+                                      or time.monotonic() - self.last_sync >= self.fsync_interval):
+                    self.sync()
+                if self.fulltext_dirty and (force or self.fulltext_interval is not None
+                                            and time.monotonic() - self.last_fulltext >= self.fulltext_interval):
+                    self.write_fulltext()
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.exception('保存记录失败: %s', e)
+            for done in waiters:
+                done.set()
+        try:
+            self.file.close()
+            for part in self.parts:
+                part.close()
+            for path in self.part_paths():
+                os.remove(path)
+        except Exception as e:
+            logger.exception('关闭记录文件失败: %s', e)
+
+    def part_paths(self):
+        if not self.fulltext_path:
+            return []
+        return [self.fulltext_path + '.source', self.fulltext_path + '.target']
+
+    def write_records(self, records):
+        content = []
+        for _, timestamp, original, translated, (source_label, target_label) in records:
+            content.append(f"[{timestamp}]\n{source_label}:\n{original}\n{target_label}:\n{translated}\n\n"
+                           "-------------------\n")
+        self.labels = records[-1][4]
+        self.file.write(''.join(content))
+        if self.parts:
+            # 各句之间以空格分隔
+            lead = '' if self.parts_empty else ' '
+            self.parts[0].write(lead + ' '.join(record[2] for record in records))
+            self.parts[1].write(lead + ' '.join(record[3] for record in records))
+            self.parts_empty = False
+        self.unsynced += len(records)
+        self.fulltext_dirty = True
+        self.stats['records'] += len(records)
+        self.stats['writes'] += 1
+
+    def sync(self):
+        for f in [self.file] + self.parts:
+            f.flush()
+            os.fsync(f.fileno())  # 强制将文件写入磁盘
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.stats['fsyncs'] += 1
+
+    def write_fulltext(self):
+        # 先写临时文件再替换，崩溃时不会留下写了一半的全文文件；两部分直接从旁路文件流式拷贝
+        self.fulltext_dirty = False
+        self.last_fulltext = time.monotonic()
+        if not self.fulltext_path:
+            return
+        tmp_path = self.fulltext_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f"=== 实时字幕与翻译记录 ===\n\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]\n")
+            for label, part, path in zip(self.labels, self.parts, self.part_paths()):
+                part.flush()
+                f.write(f'{label}:\n')
+                with open(path, encoding='utf-8') as source:
+                    shutil.copyfileobj(source, f)
+                f.write('\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.fulltext_path)
+        self.stats['fulltext_writes'] += 1
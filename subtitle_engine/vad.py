@@ -0,0 +1,84 @@
+# 语音活动检测：在识别器之前按帧判断音频中是否有语音，静音块不再送入 Vosk
+# 默认使用短时能量（自适应噪声底），安装了 webrtcvad 时可以选用 WebRTC VAD
+# 所有时间都按音频时长计算，回放录音时的分段结果与运行速度无关
+# speech_frames(samples) 返回本块各帧是否为语音，voice_end(voiced) 返回最后一个语音帧的结束时间
+# （相对本块开头的秒数），帧长不固定或帧跨越两块时也能算出正确的时间
+import numpy as np
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+class EnergyVAD:
+    # 帧能量（dBFS）高于 噪声底 + margin_db 且高于 min_db 时判为语音；
+    # 噪声底向下立即跟随，向上只在静音帧上缓慢跟随，并且不超过 max_floor_db
+    def __init__(self, sample_rate=16000, frame_ms=30, margin_db=12.0, min_db=-55.0, max_floor_db=-35.0,
+                 floor_adapt=0.05):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_seconds = self.frame_samples / sample_rate
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.max_floor_db = max_floor_db
+        self.floor_adapt = floor_adapt
+        self.noise_floor = None
+        self.last_frame_seconds = self.frame_seconds
+
+    def frame_levels(self, samples):
+        count = len(samples) // self.frame_samples
+        if count == 0:
+            # 不足一帧的块整体作为一帧
+            frames = samples.reshape(1, -1)
+            self.last_frame_seconds = len(samples) / self.sample_rate
+        else:
+            self.last_frame_seconds = self.frame_seconds
+            frames = samples[:count * self.frame_samples].reshape(count, self.frame_samples)
+        power = np.mean(np.square(frames, dtype=np.float32), axis=1) / (32768.0 * 32768.0)
+        return 10 * np.log10(power + 1e-10)
+
+    def speech_frames(self, samples):
+        # samples 为 int16 单声道数组，返回每帧是否为语音
+        levels = self.frame_levels(samples)
+        floor = levels.min() if self.noise_floor is None else min(self.noise_floor, levels.min())
+        voiced = levels > max(self.min_db, floor + self.margin_db)
+        if not voiced.all():
+            floor += self.floor_adapt * (levels[~voiced].mean() - floor)
+        self.noise_floor = min(floor, self.max_floor_db)
+        return voiced
+
+    def voice_end(self, voiced):
+        return (np.flatnonzero(voiced)[-1] + 1) * self.last_frame_seconds
+
+class WebRTCVAD:
+    # WebRTC VAD，aggressiveness 取 0~3，越大越倾向于判为静音；只支持 8/16/32/48 kHz 和 10/20/30 毫秒帧
+    # 块长不是帧长的整数倍时，末尾不足一帧的样本留到下一块开头一起判断（块比一帧短时本块可能没有完整的帧）
+    def __init__(self, sample_rate=16000, frame_ms=30, aggressiveness=2):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_seconds = self.frame_samples / sample_rate
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.remainder = b''
+        self.lead_seconds = 0.0  # 本块的帧从上一块留下的样本开始，比本块开头早这么多秒
+
+    def speech_frames(self, samples):
+        data = self.remainder + samples.tobytes()
+        size = self.frame_samples * 2
+        end = len(data) // size * size
+        self.lead_seconds = len(self.remainder) / 2 / self.sample_rate
+        self.remainder = data[end:]
+        return np.array([self.vad.is_speech(data[i:i + size], self.sample_rate)
+                         for i in range(0, end, size)], dtype=bool)
+
+    def voice_end(self, voiced):
+        return (np.flatnonzero(voiced)[-1] + 1) * self.frame_seconds - self.lead_seconds
+
+def create_vad(kind='energy', sample_rate=16000, **options):
+    # kind: 'energy'、'webrtc'，或 'auto'（安装了 webrtcvad 时用 WebRTC，否则用能量检测）
+    if kind == 'auto':
+        kind = 'webrtc' if webrtcvad is not None else 'energy'
+    if kind == 'webrtc':
+        if webrtcvad is None:
+            raise ImportError('使用 WebRTC VAD 需要安装 webrtcvad')
+        return WebRTCVAD(sample_rate, **options)
+    return EnergyVAD(sample_rate, **options)
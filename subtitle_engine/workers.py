@@ -0,0 +1,435 @@
+# 进程隔离的推理：Vosk 识别器和翻译引擎可以放到独立的子进程中运行，推理与界面线程不再争用 GIL，
+# 也能用上多个核；子进程崩溃（例如原生库 abort）不会带走主程序
+# 音频通过共享内存交给识别进程，管道上只传递长度、识别结果和译文等小消息；
+# 子进程退出、管道断开或超时时终止它，下一次请求时自动重启，短时间内反复崩溃则熔断一段时间；
+# 识别进程在后台线程中重启，重启和加载模型期间的音频直接跳过，音频处理线程不会阻塞
+#   识别: AudioProcessor(isolate=True) 使用 RecognizerProcess，接口与 KaldiRecognizer 相同
+#   翻译: isolate_engines() 把已注册的引擎替换为同名的 ProcessEngine，缓存、批处理与备用引擎逻辑不变
+import logging, multiprocessing, queue, threading, time
+from multiprocessing import shared_memory
+from . import models
+from .engines import EngineUnavailable, TranslationEngine, engines, get_engine, register_engine
+from .llm import CircuitBreaker
+from .metrics import metrics as default_metrics
+
+logger = logging.getLogger(__name__)
+
+# 主进程中已经有界面、音频和翻译线程，fork 出的子进程可能继承被锁住的锁，统一使用 spawn
+context = multiprocessing.get_context('spawn')
+
+class WorkerProcess:
+    # 受监管的子进程：target(conn, *args) 在子进程中初始化完成后发送 ('ready', None)，然后循环处理请求
+    # 每条请求的回复为 (类型, 值)：result / chunk / done / unavailable / error
+    # start_timeout: 启动（加载模型）的最长等待；timeout: 等待每条回复的最长时间，超时视为卡死
+    def __init__(self, name, target, args=(), start_timeout=300.0, timeout=300.0, breaker=None, metrics=None):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.start_timeout = start_timeout
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker(failure_threshold=3, reset_timeout=30.0, name=name)
+        self.metrics = metrics or default_metrics
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.restarts = 0
+        self.last_reply = 0.0
+        self.lock = threading.Lock()  # 同一时间只处理一个请求，回复按顺序对应
+
+    def start(self):
+        # 只启动进程，不等待初始化完成
+        parent_conn, child_conn = context.Pipe()
+        self.process = context.Process(target=self.target, args=(child_conn,) + tuple(self.args),
+                                       name=self.name, daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.ready = False
+        return self
+
+    def wait_ready(self):
+        with self.lock:
+            self.ensure_ready()
+
+    def ensure_ready(self):
+        # 调用方持有 self.lock；进程已退出时重启，并等待初始化完成
+        if self.process is not None and not self.process.is_alive():
+            self.kill(f'退出码 {self.process.exitcode}')
+        if self.process is None:
+            if self.restarts:
+                logger.warning('重启工作进程 %s', self.name)
+            self.start()
+        if not self.ready:
+            kind, value = self.receive(self.start_timeout)
+            if kind != 'ready':
+                self.kill('初始化失败')
+                raise EngineUnavailable(f'工作进程 {self.name} 初始化失败: {value}')
+            self.ready = True
+
+    def receive(self, timeout):
+        try:
+            if not self.conn.poll(timeout):
+                self.kill('响应超时')
+                raise EngineUnavailable(f'工作进程 {self.name} 响应超时')
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.kill(f'管道断开: {e!r}')
+            raise EngineUnavailable(f'工作进程 {self.name} 已退出') from None
+
+    def kill(self, reason):
+        # 终止子进程，下一次请求时重启
+        if self.process is None:
+            return
+        logger.error('工作进程 %s 异常（%s），已终止', self.name, reason)
+        self.metrics.inc('worker_restarts_total', {'worker': self.name})
+        self.restarts += 1
+        self.breaker.record_failure()
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(5)
+        self.process = None
+        self.conn.close()
+        self.ready = False
+
+    def request(self, message):
+        # 发送一条请求并返回 result 的值
+        replies = list(self.exchange(message))
+        return replies[-1][1] if replies else None
+
+    def exchange(self, message, should_cancel=None):
+        # 发送请求并逐条产出回复，直到 result 或 done；子进程崩溃或超时时抛出 EngineUnavailable
+        # should_cancel 返回 True 时通知子进程中止，之后的回复丢弃；提前关闭生成器时同样中止并读完剩余回复
+        if not self.breaker.allow():
+            raise EngineUnavailable(f'工作进程 {self.name} 反复崩溃，暂停使用')
+        with self.lock:
+            finished = False
+            cancelled = False
+            try:
+                self.ensure_ready()
+                self.conn.send(message)
+                self.last_reply = time.monotonic()
+                while True:
+                    if should_cancel is not None and not cancelled and should_cancel():
+                        self.conn.send(('cancel',))
+                        cancelled = True
+                    kind, value = self.next_reply(should_cancel is not None and not cancelled)
+                    if kind is None:
+                        continue
+                    if kind in ('unavailable', 'error'):
+                        # 子进程本身正常，只是这次请求失败
+                        finished = True
+                        self.breaker.record_success()
+                        if kind == 'unavailable':
+                            raise EngineUnavailable(value)
+                        raise RuntimeError(f'工作进程 {self.name}: {value}')
+                    if kind in ('result', 'done'):
+                        finished = True
+                        self.breaker.record_success()
+                        if kind == 'result':
+                            yield kind, value
+                        return
+                    if not cancelled:
+                        yield kind, value
+            finally:
+                if not finished:
+                    if self.process is not None:
+                        self.abandon(cancelled)
+                    self.breaker.release()
+
+    def next_reply(self, polling):
+        # polling 时最多等待 50 毫秒，没有回复返回 (None, None)，以便及时转发取消；
+        # 两条回复之间超过 timeout 仍视为卡死
+        if not polling:
+            return self.receive(self.timeout)
+        if not self.conn.poll(0.05):
+            if time.monotonic() - self.last_reply > self.timeout:
+                self.kill('响应超时')
+                raise EngineUnavailable(f'工作进程 {self.name} 响应超时')
+            return None, None
+        self.last_reply = time.monotonic()
+        return self.receive(0)
+
+    def abandon(self, cancelled):
+        # 请求被中途放弃（调用方关闭生成器或出现异常），读完剩余回复，保持请求与回复一一对应
+        try:
+            if not cancelled:
+                self.conn.send(('cancel',))
+            while self.receive(self.timeout)[0] == 'chunk':
+                pass
+        except (EngineUnavailable, OSError):
+            pass
+
+    def stop(self):
+        with self.lock:
+            if self.process is None:
+                return
+            try:
+                self.conn.send(('stop',))
+            except OSError:
+                pass
+            self.process.join(2)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(2)
+            self.process = None
+            self.conn.close()
+            self.ready = False
+
+    def get_stats(self):
+        return {
+            'alive': self.process is not None and self.process.is_alive(),
+            'pid': self.process.pid if self.process is not None else None,
+            'restarts': self.restarts,
+            'breaker': self.breaker.state,
+        }
+
+def serve(conn, handle):
+    # 子进程的请求循环：handle(message) 返回回复的值，或是产出流式片段的生成器
+    conn.send(('ready', None))
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return  # 主进程已退出
+        kind = message[0]
+        if kind == 'stop':
+            return
+        if kind == 'cancel':
+            continue  # 请求已经结束后才到达的取消
+        try:
+            result = handle(message)
+            if hasattr(result, '__next__'):
+                for piece in result:
+                    conn.send(('chunk', piece))
+                conn.send(('done', None))
+            else:
+                conn.send(('result', result))
+        except EngineUnavailable as e:
+            conn.send(('unavailable', str(e)))
+        except Exception as e:
+            logger.exception('工作进程处理请求出错: %s', e)
+            conn.send(('error', f'{type(e).__name__}: {e}'))
+
+def cancel_poller(conn):
+    # 子进程中的 should_cancel：流式请求进行中，管道上只可能收到主进程发来的取消
+    cancelled = []
+
+    def should_cancel():
+        if not cancelled and conn.poll():
+            conn.recv()
+            cancelled.append(True)
+        return bool(cancelled)
+    return should_cancel
+
+def recognizer_main(conn, lang, sample_rate, shm_name, words, factory):
+    # 识别子进程：音频从共享内存读取，每块只回传 (是否完整, 完整或部分结果的 JSON)
+    try:
+        recognizer = (factory or models.create_recognizer)(lang, sample_rate)
+        recognizer.SetWords(words)
+        shm = shared_memory.SharedMemory(name=shm_name)
+    except Exception as e:
+        conn.send(('error', f'{type(e).__name__}: {e}'))
+        return
+
+    def handle(message):
+        nonlocal shm
+        kind = message[0]
+        if kind == 'accept':
+            is_final = recognizer.AcceptWaveform(bytes(shm.buf[:message[1]]))
+            return is_final, recognizer.Result() if is_final else recognizer.PartialResult()
+        if kind == 'final':
+            return recognizer.FinalResult()
+        if kind == 'words':
+            recognizer.SetWords(message[1])
+            return None
+        if kind == 'attach':
+            # 主进程换用了更大的共享内存
+            shm.close()
+            shm = shared_memory.SharedMemory(name=message[1])
+            return None
+        raise ValueError(f'未知的请求: {kind}')
+    try:
+        serve(conn, handle)
+    finally:
+        shm.close()
+
+class RecognizerProcess:
+    # 在子进程中运行的识别器，接口与 KaldiRecognizer 相同，可直接替换 AudioProcessor.recognizer
+    # 每块音频一次往返：数据写入共享内存，子进程识别后一并返回结果，Result / PartialResult 不再走管道
+    # 子进程崩溃时当前语句丢失，本块视为没有结果；之后在后台线程中重启并重新加载模型，
+    # 子进程就绪（is_ready）之前的音频块直接跳过，不等待加载
+    # 构造时只启动子进程，不等待模型加载；words 即 SetWords 的设置，在构造时给出可省去一次等待
+    # factory(lang, sample_rate): 在子进程中创建识别器，需可被 pickle，None 为 models.create_recognizer
+    # timeout: 每块音频识别的最长等待，超时视为卡死并重启
+    def __init__(self, lang, sample_rate=16000, words=False, buffer_bytes=32000, factory=None, metrics=None,
+                 timeout=10.0):
+        self.lang = lang
+        self.sample_rate = sample_rate
+        self.factory = factory
+        self.words = words
+        self.closed = False
+        self.starter = None
+        self.shm = shared_memory.SharedMemory(create=True, size=buffer_bytes)
+        self.last_result = '{"partial" : ""}'
+        self.worker = WorkerProcess(f'recognizer-{lang}', recognizer_main, self.worker_args(), timeout=timeout,
+                                    metrics=metrics)
+        self.worker.start()
+
+    def worker_args(self):
+        # 重启时按当前的共享内存和 SetWords 设置创建识别器
+        return (self.lang, self.sample_rate, self.shm.name, self.words, self.factory)
+
+    def wait_ready(self):
+        self.worker.wait_ready()
+        return self
+
+    def is_ready(self):
+        # 子进程已初始化完成时返回 True；否则（首次启动或崩溃之后）在后台线程中启动它并等待模型加载，
+        # 返回 False，调用方跳过这块音频。反复崩溃熔断期间不再重启
+        process = self.worker.process
+        if self.worker.ready and process is not None and process.is_alive():
+            return True
+        if (not self.closed and (self.starter is None or not self.starter.is_alive())
+                and self.worker.breaker.allow()):
+            self.starter = threading.Thread(target=self.start_worker, name=f'{self.worker.name}-start', daemon=True)
+            self.starter.start()
+        return False
+
+    def start_worker(self):
+        logger.warning('识别进程 %s 启动中，加载完成前的音频不做识别', self.worker.name)
+        try:
+            self.worker.wait_ready()
+        except EngineUnavailable as e:
+            logger.error('识别进程启动失败: %s', e)
+        else:
+            # 启动成功不代表子进程已经恢复正常，熔断器的成败由之后的识别请求决定
+            self.worker.breaker.release()
+
+    def call(self, message, default):
+        if self.closed or not self.is_ready():
+            return default
+        try:
+            return self.worker.request(message)
+        except EngineUnavailable as e:
+            logger.error('识别进程不可用，本段音频的识别结果丢失: %s', e)
+            return default
+
+    def SetWords(self, words):
+        self.words = words
+        self.worker.args = self.worker_args()
+        self.call(('words', words), None)
+
+    def AcceptWaveform(self, data):
+        if self.closed or not self.is_ready():
+            self.last_result = '{"partial" : ""}'
+            return False
+        if len(data) > self.shm.size:
+            self.resize(len(data))
+        self.shm.buf[:len(data)] = data
+        is_final, self.last_result = self.call(('accept', len(data)), (False, '{"partial" : ""}'))
+        return is_final
+
+    def resize(self, size):
+        old = self.shm
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.worker.args = self.worker_args()
+        self.call(('attach', self.shm.name), None)
+        old.close()
+        old.unlink()
+
+    def Result(self):
+        return self.last_result
+
+    def PartialResult(self):
+        return self.last_result
+
+    def FinalResult(self):
+        return self.call(('final',), '{"text" : ""}')
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.worker.stop()
+        self.shm.close()
+        self.shm.unlink()
+
+def engine_main(conn, engine):
+    # 翻译子进程：engine 是主进程中注册的引擎对象（只含配置），模型在子进程中加载
+    def handle(message):
+        kind = message[0]
+        if kind == 'load':
+            engine.load(message[1])
+            return None
+        if kind == 'batch':
+            return engine.translate_batch(message[1], message[2])
+        if kind == 'stream':
+            _, text, context, pair = message
+            return engine.translate_stream(text, cancel_poller(conn), context, pair)
+        raise ValueError(f'未知的请求: {kind}')
+    serve(conn, handle)
+
+class ProcessEngine(TranslationEngine):
+    # 把引擎放到 processes 个子进程中运行，多个翻译线程可同时使用不同的进程；
+    # 子进程崩溃或超时时抛出 EngineUnavailable，由翻译层改用备用引擎，该进程在下次使用时重启
+    def __init__(self, engine, processes=1, metrics=None):
+        super().__init__(engine.name, engine.fallback)
+        self.engine = engine
+        self.batching = engine.batching
+        self.streaming = engine.streaming
+        self.incremental = engine.incremental
+        self.workers = [WorkerProcess(f'engine-{engine.name}-{index}', engine_main, (engine,), metrics=metrics)
+                        for index in range(processes)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def model_id(self, pair=None):
+        return self.engine.model_id(pair)
+
+    def available(self, pair=None):
+        return self.engine.available(pair)
+
+    def request(self, message):
+        worker = self.idle.get()
+        try:
+            return worker.request(message)
+        finally:
+            self.idle.put(worker)
+
+    def load(self, pair=None):
+        # 每个进程各自加载一份模型
+        for worker in self.workers:
+            worker.request(('load', pair))
+
+    def translate_batch(self, texts, pair=None):
+        return self.request(('batch', list(texts), pair))
+
+    def translate_stream(self, text, should_cancel=None, context=None, pair=None):
+        worker = self.idle.get()
+        try:
+            for _, piece in worker.exchange(('stream', text, context, pair), should_cancel):
+                yield piece
+        finally:
+            self.idle.put(worker)
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+    def get_stats(self):
+        return [worker.get_stats() for worker in self.workers]
+
+def isolate_engines(names=None, processes=1):
+    # 把已注册的引擎（默认全部）替换为在子进程中运行的同名引擎，子进程在首次使用时启动
+    for name in names or list(engines):
+        engine = get_engine(name)
+        if not isinstance(engine, ProcessEngine):
+            register_engine(ProcessEngine(engine, processes))
+
+def stop_workers():
+    # 停止所有引擎子进程，恢复原来的引擎
+    for name, engine in list(engines.items()):
+        if isinstance(engine, ProcessEngine):
+            engine.stop()
+            register_engine(engine.engine)
@@ -0,0 +1,175 @@
+# 离线批量转写与翻译：读取 WAV / 原始PCM 文件（或目录），以快于实时的速度送入
+# 与界面相同的 Vosk + 翻译流程，输出带词级时间戳的 SRT / VTT 字幕
+# 用法: python transcribe.py record/*.wav -o subtitles --format srt vtt --workers 4
+import argparse, json, os, sys, time, wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from subtitle_engine.engines import list_engines
+from subtitle_engine.subtitles import SUBTITLE_WRITERS
+
+AUDIO_EXTENSIONS = ('.wav', '.raw', '.pcm')
+
+# 工作进程内的全局状态，每个进程只加载一次模型
+worker_state = {}
+
+def init_worker(source_lang):
+    # 延迟导入，保证模型在各个工作进程中各加载一次，而不是在主进程加载后再 fork
+    import numpy as np
+    import subtitle_engine as pipeline
+    worker_state['np'] = np
+    worker_state['pipeline'] = pipeline
+    worker_state['source_lang'] = source_lang
+    pipeline.get_vosk_model(source_lang)
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    files.append(os.path.join(path, name))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            print(f'找不到文件: {path}', file=sys.stderr)
+    return files
+
+def read_chunks(path, chunk_frames, raw_rate, raw_channels):
+    # 返回 (采样率, 声道数, 音频块迭代器)，每块为 int16 PCM 字节
+    if path.lower().endswith('.wav'):
+        wf = wave.open(path, 'rb')
+        if wf.getsampwidth() != 2 or wf.getcomptype() != 'NONE':
+            wf.close()
+            raise ValueError(f'仅支持 16 位 PCM WAV: {path}')
+        rate, channels = wf.getframerate(), wf.getnchannels()
+        def chunks():
+            with wf:
+                while True:
+                    data = wf.readframes(chunk_frames)
+                    if not data:
+                        break
+                    yield data
+        return rate, channels, chunks()
+    def raw_chunks():
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(chunk_frames * 2 * raw_channels)
+                if not data:
+                    break
+                yield data
+    return raw_rate, raw_channels, raw_chunks()
+
+def recognize_file(path, chunk_frames, raw_rate, raw_channels):
+    np = worker_state['np']
+    pipeline = worker_state['pipeline']
+    rate, channels, chunks = read_chunks(path, chunk_frames, raw_rate, raw_channels)
+    recognizer = pipeline.create_recognizer(worker_state['source_lang'], rate)
+    recognizer.SetWords(True)
+    segments = []
+    audio_seconds = 0.0
+
+    def add_segment(result):
+        words = result.get('result', [])
+        text = result.get('text', '').strip()
+        if text and words:
+            segments.append({'start': words[0]['start'], 'end': words[-1]['end'],
+                             'text': text, 'words': words})
+
+    for data in chunks:
+        audio_seconds += len(data) / (2 * channels * rate)
+        # 与 AudioProcessor 一致：单声道直接送入，多声道先下混
+        if channels > 1:
+            pcm_data = np.frombuffer(data, dtype=np.int16)
+            pcm_data = pcm_data[:len(pcm_data) - len(pcm_data) % channels].reshape(-1, channels)
+            data = pcm_data.mean(axis=1).astype(np.int16).tobytes()
+        if recognizer.AcceptWaveform(data):
+            add_segment(json.loads(recognizer.Result()))
+    add_segment(json.loads(recognizer.FinalResult()))
+    return segments, audio_seconds
+
+def translate_segments(segments, engine, batch_size):
+    pipeline = worker_state['pipeline']
+    texts = [segment['text'] for segment in segments]
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        for segment, translation in zip(segments[i:i + batch_size], pipeline.translate_batch(batch, engine)):
+            segment['translation'] = translation
+
+def process_file(path, options):
+    start = time.perf_counter()
+    segments, audio_seconds = recognize_file(path, options['chunk_frames'],
+                                             options['raw_rate'], options['raw_channels'])
+    if options['engine'] and segments:
+        translate_segments(segments, options['engine'], options['batch_size'])
+    os.makedirs(options['output_dir'], exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    outputs = []
+    for fmt in options['formats']:
+        output = os.path.join(options['output_dir'], f'{name}.{fmt}')
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(SUBTITLE_WRITERS[fmt](segments))
+        outputs.append(output)
+    elapsed = time.perf_counter() - start
+    return {
+        'file': path,
+        'outputs': outputs,
+        'segments': len(segments),
+        'audio_seconds': audio_seconds,
+        'elapsed': elapsed,
+        'rtf': elapsed / audio_seconds if audio_seconds else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='离线批量转写与翻译音频文件')
+    parser.add_argument('paths', nargs='+', help='WAV / 原始PCM 文件或包含它们的目录')
+    parser.add_argument('-o', '--output-dir', default='subtitles')
+    parser.add_argument('--format', nargs='+', choices=sorted(SUBTITLE_WRITERS), default=['srt'])
+    parser.add_argument('--engine', choices=list_engines() + ['none'], default='MT')
+    parser.add_argument('--source-lang', default='english')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-frames', type=int, default=8000)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--raw-rate', type=int, default=16000, help='原始PCM的采样率')
+    parser.add_argument('--raw-channels', type=int, default=1, help='原始PCM的声道数')
+    args = parser.parse_args(argv)
+
+    files = collect_files(args.paths)
+    if not files:
+        parser.error('没有可处理的音频文件')
+    options = {
+        'output_dir': args.output_dir,
+        'formats': args.format,
+        'engine': None if args.engine == 'none' else args.engine,
+        'chunk_frames': args.chunk_frames,
+        'batch_size': args.batch_size,
+        'raw_rate': args.raw_rate,
+        'raw_channels': args.raw_channels,
+    }
+    workers = max(1, min(args.workers, len(files)))
+    failed = 0
+    if workers == 1:
+        init_worker(args.source_lang)
+        results = []
+        for path in files:
+            try:
+                results.append(process_file(path, options))
+            except Exception as e:
+                failed += 1
+                print(f'处理失败 {path}: {str(e)}', file=sys.stderr)
+    else:
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(args.source_lang,)) as pool:
+            futures = {pool.submit(process_file, path, options): path for path in files}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failed += 1
+                    print(f'处理失败 {futures[future]}: {str(e)}', file=sys.stderr)
+    for result in results:
+        print(f"{result['file']}: {result['segments']} 句, 音频 {result['audio_seconds']:.1f}s, "
+              f"耗时 {result['elapsed']:.1f}s (RTF {result['rtf']:.3f}) -> {', '.join(result['outputs'])}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())